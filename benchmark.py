@@ -0,0 +1,497 @@
+"""Benchmarks for the draw, metadata, render, asset, composite and history paths.
+
+Each benchmark is run against the original inline implementation from the
+Streamlit app ("legacy") and the current one, cold and warm, and the results
+are written as JSON so releases can be compared::
+
+    python benchmark.py --output results.json
+    python benchmark.py --output new.json --compare results.json
+
+``--quick`` cuts iteration counts for a smoke run. The run exits with
+status 1 when the app's time to first reading is over
+``metrics.FIRST_READING_BUDGET``.
+"""
+import argparse
+import copy
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import card_assets
+import draw_engine
+import metrics
+from card_catalog import catalog
+from card_metadata import card_metadata
+from image_cache import ImageCache, read_asset
+from reading_history import ReadingHistory
+from spread_compositor import SpreadCompositor
+from spread_engine import spreads, spreads_by_size
+
+
+# Constants
+PERCENTILES = (50, 95, 99)
+SPREAD_SIZES = (1, 3)
+RESULTS_VERSION = 1
+APP_PATH = os.path.join(card_assets.BASE_DIR, "streamlit_app.py")
+
+# Loads the app in a fresh interpreter, draws once and prints the app's own first_reading timer
+FIRST_READING_SCRIPT = """
+import json, sys
+from streamlit.testing.v1 import AppTest
+import metrics
+app = AppTest.from_file(sys.argv[1], default_timeout=300)
+app.run()
+app.button[0].click().run()
+print(json.dumps(metrics.snapshot()["timers"]["first_reading"]))
+"""
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def _summary(samples_s):
+    """Summarise per-operation timings in seconds as microseconds."""
+    samples = sorted(samples_s)
+    total = sum(samples)
+    result = {
+        "n": len(samples),
+        "mean_us": total / len(samples) * 1e6,
+        "ops_per_s": len(samples) / total if total else 0.0,
+    }
+    for pct in PERCENTILES:
+        result[f"p{pct}_us"] = _percentile(samples, pct) * 1e6
+    return result
+
+
+def _time_each(fn, n):
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _time_batch(fn, n):
+    # For sub-microsecond operations the per-call timer would dominate
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    elapsed = time.perf_counter() - start
+    return {"n": n, "mean_us": elapsed / n * 1e6, "ops_per_s": n / elapsed}
+
+
+def _isolated(fn, *args, **kwargs):
+    """Run ``fn`` in a fresh interpreter, so its peak_rss_mb covers that run alone.
+
+    ru_maxrss is the highest RSS the process has reached, so in-process
+    scenarios would each report the peak of everything that ran before them.
+    """
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(fn, *args, **kwargs).result()
+
+
+def peak_rss_mb():
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+# Legacy implementations, as they were inline in streamlit_app.py
+
+LEGACY_DECK = sorted(f for f in os.listdir(card_assets.IMAGE_DIR) if f.endswith(".png"))
+
+
+# A private instance so benchmarking does not disturb the global random state
+_legacy_rng = random.Random()
+
+
+def legacy_draw(total_cards, rng=_legacy_rng):
+    timestamp = int(time.time() * 1000)
+    entropy = int.from_bytes(os.urandom(4), "big")
+    rng.seed(timestamp ^ entropy)
+    deck_copy = LEGACY_DECK[:]
+    rng.shuffle(deck_copy)
+    selected = deck_copy[:total_cards]
+    orientations = [
+        "reversed" if rng.random() < 0.3 else "upright"
+        for _ in selected
+    ] if total_cards == 1 else ["upright"] * total_cards
+    return deck_copy, selected, orientations
+
+
+def legacy_lookup(filename, orientation):
+    meta = card_metadata.get(filename, {})
+    title = meta.get("title", filename.replace("_", " ").title())
+    meaning = meta.get(orientation, meta.get("description", "No description available."))
+    return title, meaning
+
+
+def st_image_encode(image, width):
+    """Mirror the server-side work st.image does for a PIL image or bytes.
+
+    PIL images are saved as JPEG (quality 100), then re-opened; anything wider
+    than ``width`` is resized and encoded again. JPEG bytes that already fit
+    are passed through after a header read.
+    """
+    from PIL import Image
+
+    if isinstance(image, Image.Image):
+        buf = io.BytesIO()
+        image.convert("RGB").save(buf, format="JPEG", quality=100)
+        data = buf.getvalue()
+    else:
+        data = image
+    pil_image = Image.open(io.BytesIO(data))
+    if pil_image.width > width:
+        height = int(pil_image.height * width / pil_image.width)
+        pil_image = pil_image.resize((width, height), resample=Image.BILINEAR)
+        buf = io.BytesIO()
+        pil_image.save(buf, format="JPEG", quality=90)
+        return buf.getvalue()
+    if pil_image.format != "JPEG":
+        buf = io.BytesIO()
+        pil_image.convert("RGB").save(buf, format="JPEG", quality=90)
+        return buf.getvalue()
+    return data
+
+
+def legacy_render(filename, orientation, width):
+    from PIL import Image
+
+    img = Image.open(os.path.join(card_assets.IMAGE_DIR, filename))
+    if orientation == "reversed":
+        img = img.rotate(180)
+    return st_image_encode(img, width)
+
+
+# Benchmarks
+
+def bench_draw(iterations):
+    results = {}
+    for size in SPREAD_SIZES:
+        spread = spreads_by_size[size]
+        results[f"legacy_{size}"] = _summary(_time_each(lambda: legacy_draw(size), iterations))
+        # The path the app and the API draw through
+        results[f"engine_{size}"] = _summary(_time_each(spread.draw, iterations))
+        n = iterations * 100
+        start = time.perf_counter()
+        draw_engine.draw_batch(n, size, draw_engine.new_seed(), reversal_rate=spread.reversal_rates)
+        elapsed = time.perf_counter() - start
+        results[f"batch_{size}"] = {"n": n, "mean_us": elapsed / n * 1e6, "ops_per_s": n / elapsed}
+    return results
+
+
+def bench_metadata(iterations):
+    filenames = [card.filename for card in catalog]
+    ids = list(catalog.ids)
+    state = {"i": 0}
+
+    def legacy():
+        state["i"] += 1
+        legacy_lookup(filenames[state["i"] % len(filenames)], "upright")
+
+    def current():
+        state["i"] += 1
+        card = catalog[ids[state["i"] % len(ids)]]
+        return card.title, card.meaning("upright")
+
+    return {
+        "legacy_dict": _time_batch(legacy, iterations),
+        "catalog": _time_batch(current, iterations),
+    }
+
+
+def bench_render(iterations, manifest):
+    """Per-card render cost at each display size, cold and warm."""
+    results = {}
+    filenames = [card.filename for card in catalog][:max(iterations, 1)]
+
+    for width in card_assets.WIDTHS:
+        for orientation in card_assets.ORIENTATIONS:
+            key = f"{width}_{orientation}"
+            # Legacy has no cache; the second pass only benefits from the OS page cache
+            results[f"legacy_cold_{key}"] = _summary(
+                [_time_each(lambda f=f: legacy_render(f, orientation, width), 1)[0] for f in filenames])
+            results[f"legacy_warm_{key}"] = _summary(
+                [_time_each(lambda f=f: legacy_render(f, orientation, width), 1)[0] for f in filenames])
+
+            cache = ImageCache(lambda *k: read_asset(manifest, *k))
+            results[f"cached_cold_{key}"] = _summary(
+                [_time_each(lambda f=f: st_image_encode(cache.get(f, orientation, width), width), 1)[0]
+                 for f in filenames])
+            results[f"cached_warm_{key}"] = _summary(
+                [_time_each(lambda f=f: st_image_encode(cache.get(f, orientation, width), width), 1)[0]
+                 for f in filenames])
+
+    # One-off cost of rendering all variants of a card into an empty cache
+    with tempfile.TemporaryDirectory() as tmp:
+        scratch = copy.deepcopy(manifest)
+        samples = []
+        for filename in filenames[:max(1, iterations // 10)]:
+            scratch["cards"][filename]["variants"] = {}
+            start = time.perf_counter()
+            card_assets.ensure_card(scratch, filename, cache_dir=tmp)
+            samples.append(time.perf_counter() - start)
+        results["asset_build_per_card"] = _summary(samples)
+    return results
+
+
+def bench_history(records, iterations):
+    """Append throughput and query latency of the reading history store."""
+    batch = draw_engine.draw_batch(records, 3, seed=0)
+    with tempfile.TemporaryDirectory() as tmp:
+        history = ReadingHistory(tmp, flush_interval=0)
+        start = time.perf_counter()
+        for i in range(records):
+            orientations = ["reversed" if flip else "upright" for flip in batch.reversed[i]]
+            history.append(batch.seed, 3, batch.cards[i].tolist(), orientations,
+                           int(batch.clarifier[i]), int(batch.final[i]))
+        history.flush()
+        elapsed = time.perf_counter() - start
+        return {
+            "append": {"n": records, "mean_us": elapsed / records * 1e6, "ops_per_s": records / elapsed},
+            "recent_10": _summary(_time_each(lambda: history.recent(10), iterations)),
+            "with_card_10": _summary(_time_each(lambda: history.with_card(0, 10), iterations)),
+            "card_frequencies": _summary(_time_each(history.card_frequencies, iterations)),
+        }
+
+
+def bench_composite(iterations, manifest):
+    """Cost of showing the first page of each spread as one composite or card by card.
+
+    Cold composites use a new draw each time, as a new reading does; warm ones
+    repeat the same cards and only hit the composite cache. ``per_card`` is the
+    pass-through path the app uses for spreads shown at the normal width.
+    """
+    cache = ImageCache(lambda *k: read_asset(manifest, *k))
+    results = {}
+    for key, spread in spreads.items():
+        page = min(spread.page_size, spread.size)
+        cells = spread.cells(0, page)
+        width = spread.card_width
+        compositor = SpreadCompositor(cache)
+        readings = [spread.draw() for _ in range(iterations)]
+        # Load the card variants first so only the composite itself is timed
+        for reading in readings:
+            for card_id, orientation in zip(reading.cards[:page], reading.orientations[:page]):
+                cache.get(catalog[card_id].filename, orientation, width, "png")
+                cache.get(catalog[card_id].filename, orientation, width)
+        results[f"{key}_cold"] = _summary([
+            _time_each(lambda r=r: compositor.get(r.cards[:page], r.orientations[:page], cells, width), 1)[0]
+            for r in readings
+        ])
+        first = readings[0]
+        results[f"{key}_warm"] = _summary(_time_each(
+            lambda: compositor.get(first.cards[:page], first.orientations[:page], cells, width), iterations))
+        results[f"{key}_per_card"] = _summary([
+            _time_each(lambda r=r: [
+                st_image_encode(cache.get(catalog[card_id].filename, orientation, width), width)
+                for card_id, orientation in zip(r.cards[:page], r.orientations[:page])
+            ], 1)[0]
+            for r in readings
+        ])
+    return results
+
+
+def bench_first_reading(cold_assets=False):
+    """Time to first reading of a new app process, as the app itself measures it.
+
+    With ``cold_assets`` the asset cache starts empty, so the first reading
+    also renders its card variants.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, TAROT_METRICS="1", TAROT_HISTORY_DIR=os.path.join(tmp, "history"))
+        if cold_assets:
+            env["TAROT_ASSET_CACHE"] = os.path.join(tmp, "assets")
+        out = subprocess.run([sys.executable, "-c", FIRST_READING_SCRIPT, APP_PATH], env=env,
+                             cwd=card_assets.BASE_DIR, capture_output=True, text=True, check=True)
+    count, total, _ = json.loads(out.stdout.splitlines()[-1])
+    return {"n": count, "mean_us": total / count * 1e6, "budget_us": metrics.FIRST_READING_BUDGET * 1e6}
+
+
+def _full_reading(cache, compositor, spread):
+    # Draw, show the first page as the app does, draw the clarifier, reveal the final card
+    reading = spread.draw()
+    width = spread.card_width
+    page = min(spread.page_size, spread.size)
+    if width == card_assets.THUMBNAIL_WIDTH:
+        # st.image passes the composite JPEG through unchanged
+        compositor.get(reading.cards[:page], reading.orientations[:page], spread.cells(0, page), width)
+    else:
+        for card_id, orientation in zip(reading.cards[:page], reading.orientations[:page]):
+            st_image_encode(cache.get(catalog[card_id].filename, orientation, width), width)
+    for card_id in (reading.clarifier, reading.final):
+        if card_id is not None:
+            st_image_encode(cache.get(catalog[card_id].filename, "upright", width), width)
+
+
+def _legacy_full_reading(spread_size, width):
+    deck_copy, selected, orientations = legacy_draw(spread_size)
+    for filename, orientation in zip(selected, orientations):
+        legacy_lookup(filename, orientation)
+        legacy_render(filename, orientation, width)
+    legacy_render(deck_copy[spread_size], "upright", width)
+    legacy_render(deck_copy.pop(), "upright", width)
+
+
+def bench_sessions(sessions, readings, manifest, legacy=False, spread="three_card"):
+    """Simulate concurrent sessions each running full readings of ``spread``."""
+    cache = ImageCache(lambda *k: read_asset(manifest, *k))
+    compositor = SpreadCompositor(cache)
+    spread = spreads[spread]
+    latencies = []
+    lock = threading.Lock()
+
+    def session():
+        local = []
+        for _ in range(readings):
+            start = time.perf_counter()
+            if legacy:
+                _legacy_full_reading(spread.size, spread.card_width)
+            else:
+                _full_reading(cache, compositor, spread)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=session) for _ in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    result = _summary(latencies)
+    result.update(sessions=sessions, readings_per_s=len(latencies) / wall,
+                  peak_rss_mb=peak_rss_mb(), cache=cache.stats(), spread_cache=compositor.cache.stats())
+    return result
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=card_assets.BASE_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(quick=False, sessions=8):
+    iterations = 20 if quick else 200
+    manifest = card_assets.build_assets()
+    results = {
+        "version": RESULTS_VERSION,
+        "revision": _git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "quick": quick,
+        "benchmarks": {},
+    }
+    bench = results["benchmarks"]
+    bench["startup"] = {
+        "first_reading": bench_first_reading(),
+        "first_reading_cold_assets": bench_first_reading(cold_assets=True),
+    }
+    bench["draw"] = bench_draw(iterations * 10)
+    bench["metadata"] = bench_metadata(iterations * 1000)
+    bench["render"] = bench_render(iterations // 4 if quick else len(catalog), manifest)
+    bench["composite"] = bench_composite(5 if quick else 50, manifest)
+    bench["history"] = bench_history(20_000 if quick else 200_000, iterations)
+    readings = 3 if quick else 20
+    bench["sessions"] = {
+        "cached": _isolated(bench_sessions, sessions, readings, manifest),
+        "full_deck": _isolated(bench_sessions, sessions, readings, manifest, spread="full_deck"),
+        "legacy": _isolated(bench_sessions, sessions, max(1, readings // 5), manifest, legacy=True),
+    }
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+
+def _flatten(tree, prefix=""):
+    for key, value in tree.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from _flatten(value, name + ".")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield name, value
+
+
+def compare(new, old):
+    """Print mean latency ratios (new / old) for every benchmark in both files."""
+    old_values = dict(_flatten(old["benchmarks"]))
+    print(f"{'benchmark':60} {'old':>12} {'new':>12} {'ratio':>7}")
+    for name, value in _flatten(new["benchmarks"]):
+        if not name.endswith("mean_us") or name not in old_values or not old_values[name]:
+            continue
+        print(f"{name:60} {old_values[name]:12.1f} {value:12.1f} {value / old_values[name]:7.2f}")
+
+
+def report(results):
+    for group, benches in results["benchmarks"].items():
+        print(f"[{group}]")
+        for name, stats in benches.items():
+            line = f"  {name:32} mean {stats['mean_us']:12.1f} us"
+            if "p99_us" in stats:
+                line += f"  p50 {stats['p50_us']:10.1f}  p95 {stats['p95_us']:10.1f}  p99 {stats['p99_us']:10.1f}"
+            if "budget_us" in stats:
+                line += f"  budget {stats['budget_us']:12.1f} us"
+            if "peak_rss_mb" in stats:
+                line += f"  {stats['readings_per_s']:.1f} readings/s  rss {stats['peak_rss_mb']:.0f} MB"
+            print(line)
+    print(f"peak RSS {results['peak_rss_mb']:.0f} MB")
+
+
+def over_budget(results):
+    """Names of the benchmarks whose mean is over their budget."""
+    return [
+        f"{group}.{name}"
+        for group, benches in results["benchmarks"].items()
+        for name, stats in benches.items()
+        if "budget_us" in stats and stats["mean_us"] > stats["budget_us"]
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the draw, metadata, render, asset, composite and history paths.")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="previous results JSON to compare against")
+    parser.add_argument("--sessions", type=int, default=8, help="concurrent simulated sessions")
+    parser.add_argument("--quick", action="store_true", help="fewer iterations, for a smoke run")
+    args = parser.parse_args()
+
+    results = run(quick=args.quick, sessions=args.sessions)
+    report(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(results, json.load(f))
+    failed = over_budget(results)
+    if failed:
+        print(f"over budget: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+"""Pre-rendered card image variants.
+
+Each source PNG in ``images/`` is decoded once and written out at display
+sizes, upright and reversed, into a content-hashed cache directory. The app
+serves those files directly instead of decoding the full-size PNG on every
+rerun.
+
+The cache manifest doubles as the deck manifest: one entry per source image
+with its catalog ID, content hash and pixel dimensions. ``load_deck`` brings
+it up to date with a stat per file and without importing Pillow; a missing
+variant is rendered on its own by ``ensure_variant`` on a cache miss, and
+every variant of every card at once by ``build_assets`` / ``python
+card_assets.py``.
+"""
+import argparse
+import hashlib
+import json
+import os
+import struct
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+from card_catalog import catalog
+
+
+# Constants
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGE_DIR = os.path.join(BASE_DIR, "images")
+CACHE_DIR = os.environ.get("TAROT_ASSET_CACHE", os.path.join(BASE_DIR, ".card_cache"))
+MANIFEST_NAME = "manifest.json"
+
+# Reversed cards are pre-rotated so drawing one costs the same as an upright card.
+ORIENTATIONS = ("upright", "reversed")
+
+# Display widths in pixels. 200 is what the app shows, 400 covers high-DPI screens
+# and 100 is the thumbnail size for large spreads.
+WIDTHS = (100, 200, 400)
+DEFAULT_WIDTH = 200
+THUMBNAIL_WIDTH = 100
+
+# JPEG is what st.image passes through untouched for RGB cards, WebP is the
+# smallest payload for browsers, PNG is the lossless fallback.
+FORMATS = ("jpeg", "webp", "png")
+DEFAULT_FORMAT = "jpeg"
+EXTENSIONS = {"jpeg": "jpg", "webp": "webp", "png": "png"}
+SAVE_OPTIONS = {
+    "jpeg": {"quality": 88, "optimize": True, "progressive": True},
+    "webp": {"quality": 85, "method": 4},
+    "png": {"optimize": True},
+}
+
+# Bump when widths, formats or encoder settings change so every card is rebuilt.
+BUILD_VERSION = 4
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Guards the manifest dicts and file; renders only hold their card's lock
+_manifest_lock = threading.Lock()
+_card_locks = {}
+
+
+def source_hash(path):
+    """Return a short content hash of a source image file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def png_size(path):
+    """Read (width, height) from the PNG header without decoding the image."""
+    with open(path, "rb") as f:
+        header = f.read(24)
+    if header[:8] != PNG_SIGNATURE or header[12:16] != b"IHDR":
+        raise ValueError(f"{path} is not a PNG file")
+    return struct.unpack(">II", header[16:24])
+
+
+def variant_name(filename, digest, width, fmt, orientation="upright"):
+    stem = os.path.splitext(filename)[0]
+    suffix = "r" if orientation == "reversed" else ""
+    return f"{stem}-{digest}-{width}{suffix}.{EXTENSIONS[fmt]}"
+
+
+def load_manifest(cache_dir=CACHE_DIR):
+    path = os.path.join(cache_dir, MANIFEST_NAME)
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {"version": BUILD_VERSION, "cards": {}}
+    if manifest.get("version") != BUILD_VERSION:
+        # Older layouts are re-scanned from scratch. Their variant files are
+        # removed first: the new layout may name variants differently, and
+        # nothing would refer to the old files again
+        for entry in manifest.get("cards", {}).values():
+            _remove_variants(entry, cache_dir)
+        return {"version": BUILD_VERSION, "cards": {}}
+    return manifest
+
+
+def _save_manifest(manifest, cache_dir):
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest = {"version": BUILD_VERSION, "cards": manifest["cards"]}
+    path = os.path.join(cache_dir, MANIFEST_NAME)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _render_variants(src_path, filename, digest, cache_dir, widths,
+                     orientations=ORIENTATIONS, formats=FORMATS):
+    # The only place Pillow is needed, so it is imported here rather than at startup
+    from PIL import Image
+
+    variants = {orientation: {} for orientation in orientations}
+    with Image.open(src_path) as img:
+        with metrics.timer("image_decode"):
+            img = img.convert("RGB")
+        for width in widths:
+            height = round(img.height * width / img.width)
+            with metrics.timer("image_resize"):
+                resized = img.resize((width, height), Image.LANCZOS)
+            for orientation in orientations:
+                if orientation == "reversed":
+                    # Same pixels as the old per-render img.rotate(180)
+                    with metrics.timer("image_rotate"):
+                        oriented = resized.transpose(Image.ROTATE_180)
+                else:
+                    oriented = resized
+                variants[orientation][str(width)] = {}
+                for fmt in formats:
+                    name = variant_name(filename, digest, width, fmt, orientation)
+                    tmp = os.path.join(cache_dir, f"{name}.{os.getpid()}.tmp")
+                    with metrics.timer("image_variant_encode"):
+                        oriented.save(tmp, format=fmt.upper(), **SAVE_OPTIONS[fmt])
+                    os.replace(tmp, os.path.join(cache_dir, name))
+                    variants[orientation][str(width)][fmt] = name
+    return variants
+
+
+def _entry_complete(entry, cache_dir, widths):
+    if entry.get("widths") != list(widths):
+        return False
+    variants = entry.get("variants", {})
+    for orientation in ORIENTATIONS:
+        for width in widths:
+            for fmt in FORMATS:
+                name = variants.get(orientation, {}).get(str(width), {}).get(fmt)
+                if not name or not os.path.exists(os.path.join(cache_dir, name)):
+                    return False
+    return True
+
+
+def _variant_names(variants):
+    for value in variants.values():
+        if isinstance(value, dict):
+            yield from _variant_names(value)
+        elif isinstance(value, str):
+            yield value
+
+
+def _remove_variants(entry, cache_dir, keep=()):
+    for name in _variant_names(entry.get("variants", {})):
+        if name in keep:
+            continue
+        try:
+            os.remove(os.path.join(cache_dir, os.path.basename(name)))
+        except FileNotFoundError:
+            pass
+
+
+def load_deck(image_dir=IMAGE_DIR, cache_dir=CACHE_DIR):
+    """Return the manifest with every source image's ID, hash and size current.
+
+    Unchanged files cost one stat each; only files whose size or mtime moved
+    are re-hashed. Entries for changed or removed images lose their variants,
+    which are then rendered again on the next cache miss.
+    """
+    with metrics.timer("deck_listing"):
+        return _load_deck(image_dir, cache_dir)
+
+
+def _load_deck(image_dir, cache_dir):
+    manifest = load_manifest(cache_dir)
+    old = manifest["cards"]
+    cards = {}
+    changed = False
+
+    for filename in sorted(os.listdir(image_dir)):
+        if not filename.endswith(".png"):
+            continue
+        src_path = os.path.join(image_dir, filename)
+        stat = os.stat(src_path)
+        entry = old.get(filename)
+        card_id = catalog.by_filename.get(filename)
+
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            if entry.get("id") != card_id:
+                entry["id"] = card_id
+                changed = True
+            cards[filename] = entry
+            continue
+
+        digest = source_hash(src_path)
+        if entry and entry["hash"] == digest:
+            entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns, id=card_id)
+            cards[filename] = entry
+            changed = True
+            continue
+
+        if entry:
+            _remove_variants(entry, cache_dir)
+        width, height = png_size(src_path)
+        cards[filename] = {
+            "id": card_id,
+            "hash": digest,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "width": width,
+            "height": height,
+            "widths": [],
+            "variants": {},
+        }
+        changed = True
+
+    # Drop variants of cards whose source image was removed
+    for filename, entry in old.items():
+        if filename not in cards:
+            _remove_variants(entry, cache_dir)
+            changed = True
+
+    manifest["cards"] = cards
+    if changed:
+        _save_manifest(manifest, cache_dir)
+    return manifest
+
+
+def _render_card(args):
+    src_path, filename, entry, cache_dir, widths = args
+    variants = _render_variants(src_path, filename, entry["hash"], cache_dir, widths)
+    _remove_variants(entry, cache_dir, keep=set(_variant_names(variants)))
+    return filename, dict(entry, widths=list(widths), variants=variants)
+
+
+def _card_lock(filename):
+    with _manifest_lock:
+        return _card_locks.setdefault(filename, threading.Lock())
+
+
+def _manifest_entry(manifest, filename):
+    with _manifest_lock:
+        entry = manifest["cards"].get(filename)
+    if entry is None:
+        raise KeyError(f"{filename} is not in the deck manifest")
+    return entry
+
+
+def ensure_variant(manifest, filename, orientation="upright", width=DEFAULT_WIDTH,
+                   fmt=DEFAULT_FORMAT, image_dir=IMAGE_DIR, cache_dir=CACHE_DIR):
+    """Render one missing variant of a card, updating ``manifest``, and return its path.
+
+    Only the requested size, orientation and format is encoded. Renders of
+    different cards run in parallel; the manifest lock is held just long
+    enough to record the new file.
+    """
+    with _card_lock(filename):
+        entry = _manifest_entry(manifest, filename)
+        name = entry["variants"].get(orientation, {}).get(str(width), {}).get(fmt)
+        if name and os.path.exists(os.path.join(cache_dir, name)):
+            return os.path.join(cache_dir, name)
+        os.makedirs(cache_dir, exist_ok=True)
+        metrics.count("variants_rendered")
+        with metrics.timer("variant_render"):
+            rendered = _render_variants(os.path.join(image_dir, filename), filename, entry["hash"],
+                                        cache_dir, (width,), (orientation,), (fmt,))
+        name = rendered[orientation][str(width)][fmt]
+        with _manifest_lock:
+            entry = manifest["cards"][filename]
+            entry["variants"].setdefault(orientation, {}).setdefault(str(width), {})[fmt] = name
+            _save_manifest(manifest, cache_dir)
+        return os.path.join(cache_dir, name)
+
+
+def ensure_card(manifest, filename, image_dir=IMAGE_DIR, cache_dir=CACHE_DIR, widths=WIDTHS):
+    """Render one card's variants if they are missing, updating ``manifest``."""
+    with _card_lock(filename):
+        entry = _manifest_entry(manifest, filename)
+        if _entry_complete(entry, cache_dir, widths):
+            return entry
+        os.makedirs(cache_dir, exist_ok=True)
+        src_path = os.path.join(image_dir, filename)
+        metrics.count("cards_rendered")
+        with metrics.timer("card_render"):
+            _, entry = _render_card((src_path, filename, entry, cache_dir, widths))
+        with _manifest_lock:
+            manifest["cards"][filename] = entry
+            _save_manifest(manifest, cache_dir)
+        return entry
+
+
+def build_assets(image_dir=IMAGE_DIR, cache_dir=CACHE_DIR, widths=WIDTHS, force=False,
+                 jobs=None, manifest=None):
+    """Render every missing or outdated variant and return the manifest.
+
+    Pass an already loaded ``manifest`` to update it in place, e.g. when
+    warming the cache in the background of a running app. ``jobs`` sets the
+    number of render processes (default: one per CPU).
+    """
+    deck = load_deck(image_dir, cache_dir)
+    if manifest is None:
+        manifest = deck
+    else:
+        with _manifest_lock:
+            for filename, entry in deck["cards"].items():
+                current = manifest["cards"].get(filename)
+                if current is None or current["hash"] != entry["hash"]:
+                    manifest["cards"][filename] = entry
+
+    with _manifest_lock:
+        todo = [
+            (os.path.join(image_dir, filename), filename, entry, cache_dir, widths)
+            for filename, entry in sorted(manifest["cards"].items())
+            if force or not _entry_complete(entry, cache_dir, widths)
+        ]
+
+    built = 0
+    if todo:
+        os.makedirs(cache_dir, exist_ok=True)
+        executor = None
+        if jobs == 1 or len(todo) == 1:
+            results = map(_render_card, todo)
+        else:
+            executor = ProcessPoolExecutor(max_workers=jobs)
+            results = executor.map(_render_card, todo)
+        try:
+            for filename, entry in results:
+                with _manifest_lock:
+                    manifest["cards"][filename] = entry
+                built += 1
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        with _manifest_lock:
+            _save_manifest(manifest, cache_dir)
+
+    manifest["built"] = built
+    return manifest
+
+
+def asset_path(manifest, filename, orientation="upright", width=DEFAULT_WIDTH,
+               fmt=DEFAULT_FORMAT, cache_dir=CACHE_DIR):
+    """Return the cached variant for a card, or the source PNG if there is none."""
+    entry = manifest["cards"].get(filename)
+    if entry:
+        name = entry["variants"].get(orientation, {}).get(str(width), {}).get(fmt)
+        if name:
+            return os.path.join(cache_dir, name)
+    return os.path.join(IMAGE_DIR, filename)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build pre-sized card image variants.")
+    parser.add_argument("--images", default=IMAGE_DIR, help="source PNG directory")
+    parser.add_argument("--cache", default=CACHE_DIR, help="output cache directory")
+    parser.add_argument("--force", action="store_true", help="rebuild every card")
+    parser.add_argument("--jobs", type=int, default=None, help="render processes (default: CPU count)")
+    args = parser.parse_args()
+
+    manifest = build_assets(args.images, args.cache, force=args.force, jobs=args.jobs)
+    total = len(manifest["cards"])
+    print(f"{manifest['built']} of {total} cards rebuilt in {args.cache}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Typed, indexed card catalog built once at import.
+
+Cards get small integer IDs in ``card_metadata`` order (Major Arcana first,
+then Cups, Wands, Swords and Pentacles). Draws pass those IDs around and
+look cards up with ``catalog[card_id]``.
+"""
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+from card_metadata import card_metadata
+
+
+# Constants
+IMAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "images")
+ORIENTATIONS = ("upright", "reversed")
+
+
+class CatalogError(Exception):
+    """Raised when the card metadata and the image directory disagree."""
+
+
+@dataclass(frozen=True, slots=True)
+class Card:
+    id: int
+    filename: str
+    title: str
+    arcana: str
+    suit: Optional[str]
+    rank: str
+    upright: str
+    reversed: str
+    zodiac: str
+    element: str
+    yes_no: str
+
+    def meaning(self, orientation="upright"):
+        return self.reversed if orientation == "reversed" else self.upright
+
+
+def _parse_filename(filename):
+    # major_arcana_fool.png -> ("major", None, "fool")
+    # minor_arcana_cups_ace.png -> ("minor", "cups", "ace")
+    parts = os.path.splitext(filename)[0].split("_")
+    arcana = parts[0]
+    if arcana == "minor":
+        return arcana, parts[2], "_".join(parts[3:])
+    return arcana, None, "_".join(parts[2:])
+
+
+class CardCatalog:
+    """All cards by integer ID, with secondary indexes of ID tuples."""
+
+    def __init__(self, metadata):
+        cards = []
+        for card_id, (filename, meta) in enumerate(metadata.items()):
+            arcana, suit, rank = _parse_filename(filename)
+            cards.append(Card(
+                id=card_id,
+                filename=filename,
+                title=meta["title"],
+                arcana=arcana,
+                suit=suit,
+                rank=rank,
+                upright=meta["upright"],
+                reversed=meta["reversed"],
+                zodiac=meta["zodiac"],
+                element=meta["element"],
+                yes_no=meta["yes_no"],
+            ))
+        self.cards = tuple(cards)
+        self.ids = tuple(range(len(cards)))
+        self.by_filename = {card.filename: card.id for card in cards}
+        self.by_arcana = self._index("arcana")
+        self.by_suit = self._index("suit")
+        self.by_element = self._index("element")
+        self.by_zodiac = self._index("zodiac")
+        self.by_yes_no = self._index("yes_no")
+
+    def _index(self, field):
+        index = {}
+        for card in self.cards:
+            value = getattr(card, field)
+            if value is not None:
+                index.setdefault(value, []).append(card.id)
+        return {value: tuple(ids) for value, ids in index.items()}
+
+    def __getitem__(self, card_id):
+        return self.cards[card_id]
+
+    def __len__(self):
+        return len(self.cards)
+
+    def __iter__(self):
+        return iter(self.cards)
+
+    def id_for(self, filename):
+        return self.by_filename[filename]
+
+    def check_images(self, image_dir=IMAGE_DIR):
+        """Raise CatalogError if a card has no image; return unused image names."""
+        images = {f for f in os.listdir(image_dir) if f.endswith(".png")}
+        missing = sorted(set(self.by_filename) - images)
+        if missing:
+            raise CatalogError(f"cards without an image in {image_dir}: {', '.join(missing)}")
+        return sorted(images - set(self.by_filename))
+
+
+catalog = CardCatalog(card_metadata)
+unused_images = catalog.check_images()
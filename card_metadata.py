@@ -2,7 +2,7 @@ card_metadata = {
 
     "major_arcana_fool.png": {"title": "The Fool", "upright": "New beginnings, spontaneity, free spirit.", "reversed": "Recklessness, fearlessness, risk-taking.", "zodiac": "Uranus", "element": "Air", "yes_no": "Yes"},
     "major_arcana_magician.png": {"title": "The Magician", "upright": "Manifestation, resourcefulness, power.", "reversed": "Manipulation, poor planning, untapped talents.", "zodiac": "Mercury", "element": "Air", "yes_no": "Yes"},
-    "major_arcana_high_priestess.png": {"title": "The High Priestess", "upright": "Intuition, sacred knowledge, divine feminine.", "reversed": "Secrets, disconnected from intuition, withdrawal.", "zodiac": "Moon", "element": "Water", "yes_no": "Maybe"},
+    "major_arcana_priestess.png": {"title": "The High Priestess", "upright": "Intuition, sacred knowledge, divine feminine.", "reversed": "Secrets, disconnected from intuition, withdrawal.", "zodiac": "Moon", "element": "Water", "yes_no": "Maybe"},
     "major_arcana_empress.png": {"title": "The Empress", "upright": "Femininity, beauty, nature, nurturing.", "reversed": "Creative block, dependence on others.", "zodiac": "Venus", "element": "Earth", "yes_no": "Yes"},
     "major_arcana_emperor.png": {"title": "The Emperor", "upright": "Authority, structure, fatherhood.", "reversed": "Domination, excessive control, rigidity.", "zodiac": "Aries", "element": "Fire", "yes_no": "Yes"},
     "major_arcana_hierophant.png": {"title": "The Hierophant", "upright": "Spiritual wisdom, religious beliefs, conformity.", "reversed": "Personal beliefs, freedom, challenging the status quo.", "zodiac": "Taurus", "element": "Earth", "yes_no": "Maybe"},
@@ -12,7 +12,7 @@ card_metadata = {
     "major_arcana_hermit.png": {"title": "The Hermit", "upright": "Soul-searching, introspection, being alone.", "reversed": "Isolation, loneliness, withdrawal.", "zodiac": "Virgo", "element": "Earth", "yes_no": "Maybe"},
     "major_arcana_wheel.png": {"title": "The Wheel", "upright": "Good luck, karma, life cycles, destiny.", "reversed": "Bad luck, resistance to change, breaking cycles.", "zodiac": "Jupiter", "element": "Fire", "yes_no": "Yes"},
     "major_arcana_justice.png": {"title": "Justice", "upright": "Justice, fairness, truth, law.", "reversed": "Unfairness, lack of accountability, dishonesty.", "zodiac": "Libra", "element": "Air", "yes_no": "Maybe"},
-    "major_arcana_hanged_man.png": {"title": "The Hanged Man", "upright": "Pause, surrender, letting go, new perspectives.", "reversed": "Delays, resistance, stalling.", "zodiac": "Neptune", "element": "Water", "yes_no": "No"},
+    "major_arcana_hanged.png": {"title": "The Hanged Man", "upright": "Pause, surrender, letting go, new perspectives.", "reversed": "Delays, resistance, stalling.", "zodiac": "Neptune", "element": "Water", "yes_no": "No"},
     "major_arcana_death.png": {"title": "Death", "upright": "Endings, transformation, transition.", "reversed": "Resistance to change, personal transformation.", "zodiac": "Scorpio", "element": "Water", "yes_no": "No"},
     "major_arcana_temperance.png": {"title": "Temperance", "upright": "Balance, moderation, patience, purpose.", "reversed": "Imbalance, excess, self-healing.", "zodiac": "Sagittarius", "element": "Fire", "yes_no": "Yes"},
     "major_arcana_chains.png": {"title": "Chains", "upright": "Shadow self, attachment, addiction, restriction.", "reversed": "Releasing limiting beliefs, exploring dark thoughts.", "zodiac": "Capricorn", "element": "Earth", "yes_no": "No"},
@@ -23,7 +23,7 @@ card_metadata = {
     "major_arcana_judgement.png": {"title": "Judgement", "upright": "Judgement, rebirth, inner calling, absolution.", "reversed": "Self-doubt, inner critic, ignoring the call.", "zodiac": "Pluto", "element": "Fire", "yes_no": "Yes"},
     "major_arcana_world.png": {"title": "The World", "upright": "Completion, integration, accomplishment, travel.", "reversed": "Seeking personal closure, short-cuts, delays.", "zodiac": "Saturn", "element": "Earth", "yes_no": "Yes"},
 
-    "minor_arcana_cups_1.png": {"title": "Ace of Cups", "upright": "Love and compassion.", "reversed": "Blocked emotions.", "zodiac": "Cancer", "element": "Water", "yes_no": "Yes"},
+    "minor_arcana_cups_ace.png": {"title": "Ace of Cups", "upright": "Love and compassion.", "reversed": "Blocked emotions.", "zodiac": "Cancer", "element": "Water", "yes_no": "Yes"},
     "minor_arcana_cups_2.png": {"title": "Two of Cups", "upright": "Partnership and unity.", "reversed": "Breakups or tension.", "zodiac": "Cancer", "element": "Water", "yes_no": "Yes"},
     "minor_arcana_cups_3.png": {"title": "Three of Cups", "upright": "Friendship and celebration.", "reversed": "Overindulgence.", "zodiac": "Cancer", "element": "Water", "yes_no": "Yes"},
     "minor_arcana_cups_4.png": {"title": "Four of Cups", "upright": "Apathy and contemplation.", "reversed": "Boredom, missed opportunity.", "zodiac": "Cancer", "element": "Water", "yes_no": "Yes"},
@@ -38,7 +38,7 @@ card_metadata = {
     "minor_arcana_cups_queen.png": {"title": "Queen of Cups", "upright": "Compassion and calm.", "reversed": "Codependency, emotional insecurity.", "zodiac": "Scorpio", "element": "Water", "yes_no": "Yes"},
     "minor_arcana_cups_king.png": {"title": "King of Cups", "upright": "Emotional balance and control.", "reversed": "Manipulation, mood swings.", "zodiac": "Pisces", "element": "Water", "yes_no": "Yes"},
 
-    "minor_arcana_wands_1.png": {"title": "Ace of Wands", "upright": "Inspiration and new opportunities.", "reversed": "Delays, lack of direction.", "zodiac": "Aries", "element": "Fire", "yes_no": "Yes"},
+    "minor_arcana_wands_ace.png": {"title": "Ace of Wands", "upright": "Inspiration and new opportunities.", "reversed": "Delays, lack of direction.", "zodiac": "Aries", "element": "Fire", "yes_no": "Yes"},
     "minor_arcana_wands_2.png": {"title": "Two of Wands", "upright": "Planning and progress.", "reversed": "Lack of planning.", "zodiac": "Aries", "element": "Fire", "yes_no": "Yes"},
     "minor_arcana_wands_3.png": {"title": "Three of Wands", "upright": "Expansion and foresight.", "reversed": "Obstacles, delays.", "zodiac": "Aries", "element": "Fire", "yes_no": "Yes"},
     "minor_arcana_wands_4.png": {"title": "Four of Wands", "upright": "Celebration and harmony.", "reversed": "Lack of support.", "zodiac": "Aries", "element": "Fire", "yes_no": "Yes"},
@@ -53,7 +53,7 @@ card_metadata = {
     "minor_arcana_wands_queen.png": {"title": "Queen of Wands", "upright": "Courage and determination.", "reversed": "Jealousy, selfishness.", "zodiac": "Aries", "element": "Fire", "yes_no": "Yes"},
     "minor_arcana_wands_king.png": {"title": "King of Wands", "upright": "Leadership and vision.", "reversed": "Impulsiveness, overbearing.", "zodiac": "Leo", "element": "Fire", "yes_no": "Yes"},
 
-    "minor_arcana_swords_1.png": {"title": "Ace of Swords", "upright": "Clarity and breakthroughs.", "reversed": "Confusion, misinformation.", "zodiac": "Gemini", "element": "Air", "yes_no": "Yes"},
+    "minor_arcana_swords_ace.png": {"title": "Ace of Swords", "upright": "Clarity and breakthroughs.", "reversed": "Confusion, misinformation.", "zodiac": "Gemini", "element": "Air", "yes_no": "Yes"},
     "minor_arcana_swords_2.png": {"title": "Two of Swords", "upright": "Indecision and choices.", "reversed": "Lies, stalemate.", "zodiac": "Libra", "element": "Air", "yes_no": "Maybe"},
     "minor_arcana_swords_3.png": {"title": "Three of Swords", "upright": "Heartbreak and sorrow.", "reversed": "Recovery, forgiveness.", "zodiac": "Libra", "element": "Air", "yes_no": "No"},
     "minor_arcana_swords_4.png": {"title": "Four of Swords", "upright": "Rest and recovery.", "reversed": "Burnout, stagnation.", "zodiac": "Libra", "element": "Air", "yes_no": "Yes"},
@@ -68,7 +68,7 @@ card_metadata = {
     "minor_arcana_swords_queen.png": {"title": "Queen of Swords", "upright": "Independence and perception.", "reversed": "Cold-hearted, cruel, bitterness.", "zodiac": "Libra", "element": "Air", "yes_no": "Maybe"},
     "minor_arcana_swords_king.png": {"title": "King of Swords", "upright": "Authority and truth.", "reversed": "Manipulation, misuse of power.", "zodiac": "Aquarius", "element": "Air", "yes_no": "Yes"},
 
-    "minor_arcana_pentacles_1.png": {"title": "Ace of Pentacles", "upright": "Prosperity and new ventures.", "reversed": "Missed opportunity, instability.", "zodiac": "Taurus", "element": "Earth", "yes_no": "Yes"},
+    "minor_arcana_pentacles_ace.png": {"title": "Ace of Pentacles", "upright": "Prosperity and new ventures.", "reversed": "Missed opportunity, instability.", "zodiac": "Taurus", "element": "Earth", "yes_no": "Yes"},
     "minor_arcana_pentacles_2.png": {"title": "Two of Pentacles", "upright": "Balance and adaptability.", "reversed": "Financial disarray, juggling too much.", "zodiac": "Capricorn", "element": "Earth", "yes_no": "Yes"},
     "minor_arcana_pentacles_3.png": {"title": "Three of Pentacles", "upright": "Collaboration and skill.", "reversed": "Disorganization, lack of teamwork.", "zodiac": "Capricorn", "element": "Earth", "yes_no": "Yes"},
     "minor_arcana_pentacles_4.png": {"title": "Four of Pentacles", "upright": "Control and security.", "reversed": "Greed, insecurity.", "zodiac": "Capricorn", "element": "Earth", "yes_no": "Yes"},
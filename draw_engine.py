@@ -0,0 +1,94 @@
+"""Batch draw engine backed by NumPy random streams.
+
+A reading is identified by ``(seed, index)``. Readings are grouped into
+chunks of ``CHUNK_SIZE``; each chunk has its own ``numpy.random.Generator``
+spawned from the seed, and every reading consumes a fixed-width row of that
+stream (shuffle keys for the whole deck, then one orientation draw per spread
+position). Any reading can therefore be regenerated on its own, batches can
+be split across processes by index range, and nothing touches the global
+``random`` module that all Streamlit sessions share.
+"""
+import secrets
+from dataclasses import dataclass
+
+import numpy as np
+
+from card_catalog import catalog
+
+
+# Constants
+DECK_SIZE = len(catalog)
+CHUNK_SIZE = 1 << 14
+NO_CARD = -1
+
+
+@dataclass(frozen=True)
+class Readings:
+    """N readings as parallel arrays, one row per reading."""
+    seed: int
+    index: np.ndarray      # (n,) reading index within the seed's stream
+    order: np.ndarray      # (n, deck_size) shuffled card IDs
+    cards: np.ndarray      # (n, spread_size) card IDs in spread order
+    reversed: np.ndarray   # (n, spread_size) True where the card is reversed
+    clarifier: np.ndarray  # (n,) next card after the spread, NO_CARD if none left
+    final: np.ndarray      # (n,) bottom card of the deck, NO_CARD if none left
+
+    def __len__(self):
+        return len(self.index)
+
+
+def new_seed():
+    """Return a fresh 64-bit seed from the OS entropy source."""
+    return secrets.randbits(64)
+
+
+def _chunk_stream(seed, chunk, offset):
+    bit_generator = np.random.PCG64(np.random.SeedSequence(seed, spawn_key=(chunk,)))
+    if offset:
+        # Generator.random consumes exactly one 64-bit output per float
+        bit_generator.advance(offset)
+    return np.random.Generator(bit_generator)
+
+
+def draw_batch(n, spread_size, seed, start=0, reversal_rate=0.0, deck_size=DECK_SIZE):
+    """Draw ``n`` independent readings starting at reading index ``start``.
+
+    ``reversal_rate`` is one probability for every position, or a sequence
+    with one per spread position; spreads pass their own from
+    ``spread_definitions``.
+    ``draw_batch(1, size, seed, start=i)`` returns exactly row ``i - s`` of
+    any batch with the same seed that started at ``s`` and covers ``i``.
+    """
+    if not 0 < spread_size <= deck_size:
+        raise ValueError(f"spread_size must be between 1 and {deck_size}")
+    row_width = deck_size + spread_size
+    order = np.empty((n, deck_size), dtype=np.uint8 if deck_size <= 256 else np.uint16)
+    flips = np.empty((n, spread_size), dtype=bool)
+
+    # Work one chunk at a time so memory stays bounded for large batches
+    i = 0
+    while i < n:
+        chunk, row = divmod(start + i, CHUNK_SIZE)
+        rows = min(n - i, CHUNK_SIZE - row)
+        u = _chunk_stream(seed, chunk, row * row_width).random((rows, row_width))
+        order[i:i + rows] = np.argsort(u[:, :deck_size], axis=1)
+        np.less(u[:, deck_size:], reversal_rate, out=flips[i:i + rows])
+        i += rows
+
+    clarifier = np.full(n, NO_CARD, dtype=np.int16)
+    final = np.full(n, NO_CARD, dtype=np.int16)
+    if spread_size < deck_size:
+        clarifier[:] = order[:, spread_size]
+    if spread_size + 1 < deck_size:
+        final[:] = order[:, -1]
+
+    return Readings(
+        seed=seed,
+        index=np.arange(start, start + n, dtype=np.int64),
+        order=order,
+        cards=order[:, :spread_size],
+        reversed=flips,
+        clarifier=clarifier,
+        final=final,
+    )
+
@@ -0,0 +1,329 @@
+"""Offline fairness verifier for the shuffle.
+
+Runs the production draw path (``draw_engine.draw_batch`` with a spread's
+per-position reversal rates, exactly as ``Spread.draw`` calls it) for as
+many readings as asked, across a process pool, and streams the results
+into fixed-size count tables:
+
+* card x position counts, and how many of those were reversed;
+* clarifier and final card counts, where the spread has them.
+
+The report gives chi-square tests for uniform cards per position, per card
+across positions, for the whole position table, for the clarifier and
+final cards, and for the reversal rate of every position against the rate
+its spread definition declares. Counts are checkpointed, so an interrupted
+run picks up where it stopped::
+
+    python fairness.py --spread three_card --readings 100000000 --checkpoint run.npz
+    python fairness.py --resume run.npz
+
+Work is split into units of ``UNIT_SIZE`` readings. Every unit derives its
+own seeds from the run seed, and each seed draws ``--per-seed`` consecutive
+readings. ``--per-seed 1`` matches the app, which draws index 0 of a fresh
+seed. The default follows the batch and API path, reading one seed's stream.
+"""
+import argparse
+import json
+import math
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import draw_engine
+from card_catalog import catalog
+from spread_engine import spreads
+
+
+# Constants
+UNIT_SIZE = 1 << 16
+DEFAULT_PER_SEED = draw_engine.CHUNK_SIZE
+CHECKPOINT_INTERVAL = 60.0
+CHECKPOINT_VERSION = 1
+# Tests below this p-value, after a Bonferroni correction over every test in the report, are flagged
+ALPHA = 0.001
+
+
+def chi2_sf(statistic, df):
+    """Survival function of the chi-square distribution (no SciPy needed)."""
+    if statistic <= 0:
+        return 1.0
+    a, x = df / 2.0, statistic / 2.0
+    log_prefix = a * math.log(x) - x - math.lgamma(a)
+    if x < a + 1:
+        # Series for the lower incomplete gamma
+        term = total = 1.0 / a
+        n = a
+        while abs(term) > abs(total) * 1e-15:
+            n += 1
+            term *= x / n
+            total += term
+        return max(0.0, 1.0 - math.exp(log_prefix) * total)
+    # Continued fraction for the upper incomplete gamma (modified Lentz)
+    tiny = 1e-300
+    b = x + 1.0 - a
+    c = 1.0 / tiny
+    d = 1.0 / b
+    h = d
+    for i in range(1, 10000):
+        an = -i * (i - a)
+        b += 2.0
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1.0 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1.0) < 1e-15:
+            break
+    return math.exp(log_prefix) * h
+
+
+def chi_square(observed, expected):
+    """Pearson statistic of ``observed`` against ``expected``, over cells with expected > 0."""
+    observed = np.asarray(observed, dtype=np.float64)
+    expected = np.asarray(expected, dtype=np.float64)
+    mask = expected > 0
+    return float(np.sum((observed[mask] - expected[mask]) ** 2 / expected[mask]))
+
+
+def unit_seeds(run_seed, unit, per_seed):
+    """The draw_engine seeds a work unit uses, derived only from the run seed."""
+    count = -(-UNIT_SIZE // per_seed)
+    state = np.random.SeedSequence(run_seed, spawn_key=(unit,)).generate_state(count, np.uint64)
+    return [int(seed) for seed in state]
+
+
+def empty_counts(spread):
+    deck = len(catalog)
+    return {
+        "position": np.zeros((spread.size, deck), dtype=np.int64),
+        "reversed": np.zeros((spread.size, deck), dtype=np.int64),
+        "clarifier": np.zeros(deck, dtype=np.int64),
+        "final": np.zeros(deck, dtype=np.int64),
+    }
+
+
+def count_unit(args):
+    """Draw one unit of readings and return its count tables."""
+    spread_key, run_seed, unit, per_seed = args
+    spread = spreads[spread_key]
+    deck = len(catalog)
+    counts = empty_counts(spread)
+    flat_positions = np.arange(spread.size, dtype=np.int64) * deck
+
+    remaining = UNIT_SIZE
+    for seed in unit_seeds(run_seed, unit, per_seed):
+        n = min(per_seed, remaining)
+        remaining -= n
+        readings = draw_engine.draw_batch(n, spread.size, seed, reversal_rate=spread.reversal_rates)
+        cells = (readings.cards + flat_positions).ravel()
+        counts["position"] += np.bincount(cells, minlength=spread.size * deck).reshape(spread.size, deck)
+        counts["reversed"] += np.bincount(cells[readings.reversed.ravel()],
+                                          minlength=spread.size * deck).reshape(spread.size, deck)
+        if spread.clarifier and readings.clarifier[0] != draw_engine.NO_CARD:
+            counts["clarifier"] += np.bincount(readings.clarifier, minlength=deck)
+        if spread.final and readings.final[0] != draw_engine.NO_CARD:
+            counts["final"] += np.bincount(readings.final, minlength=deck)
+    return counts
+
+
+def save_checkpoint(path, state):
+    tmp = f"{path}.{os.getpid()}.tmp.npz"
+    meta = {key: state[key] for key in ("version", "spread", "run_seed", "per_seed", "units", "done")}
+    np.savez(tmp, meta=json.dumps(meta), **state["counts"])
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path):
+    with np.load(path) as data:
+        meta = json.loads(str(data["meta"]))
+        if meta.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"{path} is not a version {CHECKPOINT_VERSION} checkpoint")
+        meta["counts"] = {name: data[name].copy() for name in ("position", "reversed", "clarifier", "final")}
+    return meta
+
+
+def run(state, jobs=None, checkpoint=None, progress=None):
+    """Count every unit from ``state["done"]`` to ``state["units"]``, updating ``state``."""
+    counts = state["counts"]
+    args = [(state["spread"], state["run_seed"], unit, state["per_seed"])
+            for unit in range(state["done"], state["units"])]
+    last_checkpoint = time.monotonic()
+    window = 4 * (jobs or os.cpu_count() or 1)
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        # Units finish in order, so everything before ``done`` is always counted
+        pending = deque()
+        for unit_args in args:
+            pending.append(executor.submit(count_unit, unit_args))
+            if len(pending) < window:
+                continue
+            _merge(counts, pending.popleft().result())
+            state["done"] += 1
+            if progress:
+                progress(state)
+            if checkpoint and time.monotonic() - last_checkpoint > CHECKPOINT_INTERVAL:
+                save_checkpoint(checkpoint, state)
+                last_checkpoint = time.monotonic()
+        while pending:
+            _merge(counts, pending.popleft().result())
+            state["done"] += 1
+            if progress:
+                progress(state)
+    if checkpoint:
+        save_checkpoint(checkpoint, state)
+    return state
+
+
+def _merge(counts, unit_counts):
+    for name, table in unit_counts.items():
+        counts[name] += table
+
+
+def analyse(state):
+    """Chi-square statistics for every table in ``state["counts"]``."""
+    spread = spreads[state["spread"]]
+    counts = state["counts"]
+    deck = len(catalog)
+    readings = state["done"] * UNIT_SIZE
+    position = counts["position"]
+    tests = []
+
+    def test(name, observed, expected, df):
+        statistic = chi_square(observed, expected)
+        tests.append({"test": name, "chi2": statistic, "df": df, "p": chi2_sf(statistic, df)})
+
+    for p, pos in enumerate(spread.positions):
+        test(f"cards at position {p + 1} ({pos.label or 'card'})", position[p],
+             np.full(deck, readings / deck), deck - 1)
+    if spread.size > 1:
+        for card in catalog:
+            card_total = position[:, card.id].sum()
+            test(f"positions of {card.title}", position[:, card.id],
+                 np.full(spread.size, card_total / spread.size), spread.size - 1)
+        expected = np.full(position.shape, readings / deck)
+        # Every row is a multinomial of its own; a full deck also fixes every column total
+        df = spread.size * (deck - 1) if spread.size < deck else (deck - 1) ** 2
+        test("card x position table", position, expected, df)
+
+    for p, pos in enumerate(spread.positions):
+        rate = pos.reversal_rate
+        reversed_ = counts["reversed"][p]
+        if 0 < rate < 1:
+            observed = np.concatenate([reversed_, position[p] - reversed_])
+            expected = np.concatenate([position[p] * rate, position[p] * (1 - rate)])
+            test(f"reversals at position {p + 1} (rate {rate})", observed, expected, deck)
+        else:
+            # A fixed rule: any deviation at all is a failure
+            wrong = int(reversed_.sum()) if rate == 0 else int((position[p] - reversed_).sum())
+            tests.append({"test": f"reversals at position {p + 1} (rate {rate})",
+                          "chi2": float(wrong), "df": 0, "p": 1.0 if wrong == 0 else 0.0})
+
+    for name in ("clarifier", "final"):
+        total = counts[name].sum()
+        if total:
+            test(f"{name} cards", counts[name], np.full(deck, total / deck), deck - 1)
+
+    threshold = ALPHA / max(1, len(tests))
+    for entry in tests:
+        entry["flagged"] = entry["p"] < threshold
+
+    # Largest relative deviations from the expected count, for a quick look at any bias
+    expected_cell = readings / deck
+    deviation = (position - expected_cell) / math.sqrt(expected_cell) if readings else position * 0.0
+    worst = np.argsort(-np.abs(deviation), axis=None)[:5]
+    return {
+        "spread": spread.key,
+        "readings": readings,
+        "seed_bits": 64,
+        "per_seed": state["per_seed"],
+        "alpha": ALPHA,
+        "bonferroni_threshold": threshold,
+        "min_p": min(entry["p"] for entry in tests) if tests else 1.0,
+        "flagged": sum(entry["flagged"] for entry in tests),
+        "tests": tests,
+        "largest_deviations": [
+            {"position": int(p) + 1, "card": catalog[int(c)].title, "z": float(deviation[p, c])}
+            for p, c in zip(*np.unravel_index(worst, position.shape))
+        ],
+    }
+
+
+def report(results, verbose=False):
+    print(f"{results['readings']:,} {results['spread']} readings, "
+          f"{results['per_seed']} per 64-bit seed")
+    print(f"{len(results['tests'])} tests, smallest p = {results['min_p']:.3g}, "
+          f"{results['flagged']} below the Bonferroni threshold {results['bonferroni_threshold']:.2g}")
+    for entry in results["tests"]:
+        if verbose or entry["flagged"] or not entry["test"].startswith("positions of"):
+            flag = "  FLAGGED" if entry["flagged"] else ""
+            print(f"  {entry['test']:44} chi2 {entry['chi2']:12.2f}  df {entry['df']:5}  "
+                  f"p {entry['p']:.4f}{flag}")
+    print("largest card/position deviations:")
+    for entry in results["largest_deviations"]:
+        print(f"  position {entry['position']:2}  {entry['card']:22} z {entry['z']:+.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that the production shuffle is uniform.")
+    parser.add_argument("--spread", default="three_card", choices=list(spreads))
+    parser.add_argument("--readings", type=int, default=10_000_000,
+                        help=f"readings to simulate, rounded up to units of {UNIT_SIZE}")
+    parser.add_argument("--per-seed", type=int, default=DEFAULT_PER_SEED,
+                        help="consecutive readings drawn from each seed (1 = the app's path)")
+    parser.add_argument("--seed", type=int, default=None, help="run seed (default: random)")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--checkpoint", help="save counts here, every minute and at the end")
+    parser.add_argument("--resume", metavar="CHECKPOINT", help="continue a checkpointed run")
+    parser.add_argument("--output", help="write the analysis as JSON to this file")
+    parser.add_argument("--verbose", action="store_true", help="list every per-card test")
+    args = parser.parse_args()
+
+    if args.resume:
+        state = load_checkpoint(args.resume)
+        checkpoint = args.checkpoint or args.resume
+    else:
+        if args.per_seed < 1:
+            parser.error("--per-seed must be at least 1")
+        state = {
+            "version": CHECKPOINT_VERSION,
+            "spread": args.spread,
+            "run_seed": args.seed if args.seed is not None else draw_engine.new_seed(),
+            "per_seed": args.per_seed,
+            "units": -(-args.readings // UNIT_SIZE),
+            "done": 0,
+            "counts": empty_counts(spreads[args.spread]),
+        }
+        checkpoint = args.checkpoint
+
+    started = time.monotonic()
+    first = state["done"]
+
+    def progress(state):
+        elapsed = time.monotonic() - started
+        rate = (state["done"] - first) * UNIT_SIZE / elapsed if elapsed else 0.0
+        print(f"\r{state['done']}/{state['units']} units, {rate:,.0f} readings/s", end="", flush=True)
+
+    try:
+        run(state, args.jobs, checkpoint, progress)
+    except KeyboardInterrupt:
+        # The last periodic checkpoint is consistent; counts since then are redone on resume
+        if checkpoint and os.path.exists(checkpoint):
+            print(f"\ninterrupted; resume with --resume {checkpoint}")
+        raise SystemExit(1)
+    print()
+
+    results = analyse(state)
+    results["run_seed"] = state["run_seed"]
+    report(results, args.verbose)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
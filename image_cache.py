@@ -0,0 +1,111 @@
+"""Process-wide cache of encoded card images.
+
+Streamlit reruns the script for every session, so card bytes are kept in one
+cache per process, shared by all sessions, instead of per-session copies.
+Entries are keyed by (filename, orientation, width, format) and evicted
+least recently used first once the byte budget is exceeded.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import card_assets
+import metrics
+
+
+# Constants
+DEFAULT_MAX_BYTES = int(os.environ.get("TAROT_IMAGE_CACHE_BYTES", 64 * 1024 * 1024))
+
+
+def read_asset(manifest, filename, orientation, width, fmt=card_assets.DEFAULT_FORMAT):
+    """Load the encoded bytes of a pre-rendered card variant.
+
+    A variant that has not been rendered yet is built on the spot, on its
+    own, so the first reading never waits for the rest of the deck or the
+    card's other sizes and formats.
+    """
+    path = card_assets.asset_path(manifest, filename, orientation, width, fmt)
+    if os.path.dirname(path) != card_assets.CACHE_DIR or not os.path.exists(path):
+        path = card_assets.ensure_variant(manifest, filename, orientation, width, fmt)
+    with metrics.timer("image_open"), open(path, "rb") as f:
+        return f.read()
+
+
+class ImageCache:
+    """Thread-safe LRU cache of encoded images with a byte budget.
+
+    ``loader(filename, orientation, width, fmt)`` is called on a miss and
+    must return the encoded image bytes. ``fetch`` takes any hashable key
+    tuple, which is unpacked into the loader call the same way.
+    """
+
+    def __init__(self, loader, max_bytes=DEFAULT_MAX_BYTES):
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, filename, orientation="upright", width=card_assets.DEFAULT_WIDTH,
+            fmt=card_assets.DEFAULT_FORMAT):
+        return self.fetch((filename, orientation, width, fmt))
+
+    def fetch(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+            self.misses += 1
+
+        # Load outside the lock so one slow read does not block other sessions
+        data = self.loader(*key)
+        self._put(key, data)
+        return data
+
+    def _put(self, key, data):
+        size = len(data)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= len(old)
+            self._entries[key] = data
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted)
+                self.evictions += 1
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def gauges(self, prefix="image_cache_"):
+        """Stats as flat gauges, for ``metrics.add_collector``."""
+        return {prefix + name: value for name, value in self.stats().items()}
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,163 @@
+"""Lightweight timing and counter instrumentation for the hot paths.
+
+Disabled unless ``TAROT_METRICS=1`` (or ``TAROT_TRACE=1``) is set. When
+disabled ``timer`` hands back one shared no-op context manager and ``count``
+returns straight away, so instrumented code pays a global lookup and a call.
+
+Metrics are exposed in the Prometheus text format by ``render_prometheus``:
+the reading API serves it at ``/metrics``, and ``start_file_flusher``
+writes it to a file every few seconds for the Streamlit app
+(``TAROT_METRICS_FILE``). With ``TAROT_TRACE=1`` every timed span on the
+current thread is also collected between ``begin_trace`` and ``end_trace``,
+which the app uses for per-rerun trace output.
+"""
+import contextlib
+import os
+import threading
+import time
+
+
+# Constants
+TRACE = os.environ.get("TAROT_TRACE") == "1"
+ENABLED = TRACE or os.environ.get("TAROT_METRICS") == "1"
+METRICS_FILE = os.environ.get("TAROT_METRICS_FILE")
+FLUSH_INTERVAL = float(os.environ.get("TAROT_METRICS_INTERVAL", 10))
+PREFIX = "tarot_"
+# Time-to-first-reading budget in seconds: the app logs a warning past it and
+# ``benchmark.py`` fails
+FIRST_READING_BUDGET = float(os.environ.get("TAROT_FIRST_READING_BUDGET", 2.0))
+
+_NOOP = contextlib.nullcontext()
+_lock = threading.Lock()
+_counters = {}
+_timers = {}       # name -> [count, total seconds, max seconds]
+_collectors = []   # callables returning {gauge name: value}
+_trace = threading.local()
+_flushers = {}
+
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def enable(trace=False):
+    """Turn collection on at runtime, e.g. from a benchmark or a shell."""
+    global ENABLED, TRACE
+    ENABLED = True
+    TRACE = TRACE or trace
+
+
+def timer(name):
+    """Context manager recording how long the block took under ``name``."""
+    if not ENABLED:
+        return _NOOP
+    return _Timer(name)
+
+
+def observe(name, seconds):
+    if not ENABLED:
+        return
+    with _lock:
+        stats = _timers.get(name)
+        if stats is None:
+            _timers[name] = [1, seconds, seconds]
+        else:
+            stats[0] += 1
+            stats[1] += seconds
+            if seconds > stats[2]:
+                stats[2] = seconds
+    spans = getattr(_trace, "spans", None)
+    if spans is not None:
+        spans.append((name, seconds))
+
+
+def count(name, n=1):
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def add_collector(collector):
+    """Register a callable returning gauges, sampled when metrics are rendered."""
+    with _lock:
+        if collector not in _collectors:
+            _collectors.append(collector)
+
+
+def begin_trace():
+    if TRACE:
+        _trace.spans = []
+
+
+def end_trace():
+    """Return the spans recorded on this thread since ``begin_trace``."""
+    spans = getattr(_trace, "spans", None)
+    _trace.spans = None
+    return spans or []
+
+
+def snapshot():
+    with _lock:
+        counters = dict(_counters)
+        timers = {name: list(stats) for name, stats in _timers.items()}
+        collectors = list(_collectors)
+    gauges = {}
+    for collector in collectors:
+        gauges.update(collector())
+    return {"counters": counters, "timers": timers, "gauges": gauges}
+
+
+def render_prometheus():
+    data = snapshot()
+    lines = []
+    for name, value in sorted(data["counters"].items()):
+        lines.append(f"# TYPE {PREFIX}{name}_total counter")
+        lines.append(f"{PREFIX}{name}_total {value}")
+    for name, (n, total, longest) in sorted(data["timers"].items()):
+        lines.append(f"# TYPE {PREFIX}{name}_seconds summary")
+        lines.append(f"{PREFIX}{name}_seconds_count {n}")
+        lines.append(f"{PREFIX}{name}_seconds_sum {total:.9f}")
+        lines.append(f"# TYPE {PREFIX}{name}_seconds_max gauge")
+        lines.append(f"{PREFIX}{name}_seconds_max {longest:.9f}")
+    for name, value in sorted(data["gauges"].items()):
+        lines.append(f"# TYPE {PREFIX}{name} gauge")
+        lines.append(f"{PREFIX}{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def write_file(path):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(tmp, path)
+
+
+def start_file_flusher(path, interval=FLUSH_INTERVAL):
+    """Rewrite ``path`` with the current metrics every ``interval`` seconds."""
+    if path in _flushers:
+        return _flushers[path]
+
+    def flush():
+        while True:
+            time.sleep(interval)
+            try:
+                write_file(path)
+            except OSError:
+                pass
+
+    thread = threading.Thread(target=flush, name="metrics-flusher", daemon=True)
+    thread.start()
+    _flushers[path] = thread
+    return thread
@@ -0,0 +1,391 @@
+"""Headless HTTP/JSON reading service.
+
+Serves complete readings from the same catalog and draw engine as the
+Streamlit app, plus the pre-sized card images from the asset cache. It uses
+only the standard library: each worker process runs an asyncio server, and
+``--workers`` starts several of them on one port via SO_REUSEPORT. With more
+than one worker the card images come from the shared asset pack, mapped
+read-only by every worker, instead of a private cache per process.
+
+Endpoints::
+
+    GET /reading?spread=celtic_cross&seed=123&index=0&width=200&format=webp
+    GET /reading?cards=3   (the first defined spread with that many cards)
+    GET /cards/<variant file name>
+    GET /spread?ids=12,40,3&reversed=0,1,0&layout=row&width=200
+    GET /spreads
+    GET /healthz
+    GET /metrics   (Prometheus text; enable collection with TAROT_METRICS=1)
+
+Run with ``python reading_api.py --port 8080 --workers 4``.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+from urllib.parse import parse_qs, urlsplit
+
+import card_assets
+import metrics
+from card_catalog import catalog
+from image_cache import ImageCache, read_asset
+from shared_assets import SharedAssets, ensure_pack
+from spread_compositor import LAYOUTS, SpreadCompositor
+from spread_engine import spreads, spreads_by_size
+
+
+# Constants
+CONTENT_TYPES = {"jpg": "image/jpeg", "webp": "image/webp", "png": "image/png"}
+MAX_HEADER_BYTES = 16 * 1024
+# Requests are GET only, so a body is only ever drained; larger ones are refused
+MAX_BODY_BYTES = 16 * 1024
+KEEPALIVE_TIMEOUT = 15
+# Routes that do CPU-bound work; they run on the default executor so one slow
+# request does not stall every other connection on the worker's event loop
+BLOCKING_PATHS = ("/spread",)
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+}
+
+logger = logging.getLogger(__name__)
+
+
+class BadRequest(Exception):
+    """Raised for invalid query parameters; the message is sent to the client."""
+
+
+class ReadingService:
+    """Builds readings and serves card images for one worker process."""
+
+    def __init__(self, manifest, images=None):
+        self.manifest = manifest
+        self.images = images or ImageCache(lambda *key: read_asset(manifest, *key))
+        metrics.add_collector(self.images.gauges)
+        self.spreads = SpreadCompositor(self.images)
+        metrics.add_collector(lambda: self.spreads.cache.gauges("spread_cache_"))
+        # Variant file name -> cache key, for the static image route
+        self.variants = {}
+        for filename, entry in manifest["cards"].items():
+            for orientation, sizes in entry["variants"].items():
+                for width, formats in sizes.items():
+                    for fmt, name in formats.items():
+                        self.variants[name] = (filename, orientation, int(width), fmt)
+
+    def image_url(self, card, orientation, width, fmt):
+        path = card_assets.asset_path(self.manifest, card.filename, orientation, width, fmt)
+        return "/cards/" + os.path.basename(path)
+
+    def spread_url(self, spread, card_ids, orientations, width):
+        ids = ",".join(str(card_id) for card_id in card_ids)
+        flags = ",".join("1" if orientation == "reversed" else "0" for orientation in orientations)
+        return f"/spread?ids={ids}&reversed={flags}&layout={spread.key}&width={width}"
+
+    def card_json(self, card_id, orientation, width, fmt, label=None):
+        card = catalog[card_id]
+        return {
+            "id": card.id,
+            "label": label,
+            "title": card.title,
+            "orientation": orientation,
+            "meaning": card.meaning(orientation),
+            "arcana": card.arcana,
+            "suit": card.suit,
+            "upright": card.upright,
+            "reversed": card.reversed,
+            "zodiac": card.zodiac,
+            "element": card.element,
+            "yes_no": card.yes_no,
+            "image": self.image_url(card, orientation, width, fmt),
+        }
+
+    def reading(self, query):
+        if "spread" in query:
+            spread = spreads.get(query["spread"][0])
+            if spread is None:
+                raise BadRequest(f"spread must be one of {list(spreads)}")
+        else:
+            spread = spreads_by_size.get(_int_param(query, "cards", 3))
+            if spread is None:
+                raise BadRequest(f"cards must be one of {sorted(spreads_by_size)}")
+        seed = _int_param(query, "seed", None)
+        index = _int_param(query, "index", 0)
+        width = _int_param(query, "width", card_assets.DEFAULT_WIDTH)
+        if width not in card_assets.WIDTHS:
+            raise BadRequest(f"width must be one of {list(card_assets.WIDTHS)}")
+        fmt = query.get("format", [card_assets.DEFAULT_FORMAT])[0]
+        if fmt not in card_assets.FORMATS:
+            raise BadRequest(f"format must be one of {list(card_assets.FORMATS)}")
+        if seed is not None and not 0 <= seed < 2 ** 64:
+            raise BadRequest("seed must be a 64-bit unsigned integer")
+        if index < 0:
+            raise BadRequest("index must not be negative")
+
+        with metrics.timer("shuffle"):
+            reading = spread.draw(seed=seed, index=index)
+        metrics.count("readings")
+        cards = [
+            self.card_json(card_id, orientation, width, fmt, position.label)
+            for position, card_id, orientation in zip(spread.positions, reading.cards, reading.orientations)
+        ]
+        return {
+            "seed": reading.seed,
+            "index": index,
+            "layout": spread.key,
+            "title": spread.title,
+            "cards": spread.size,
+            "spread": cards,
+            "spread_image": self.spread_url(spread, reading.cards, reading.orientations, width),
+            "clarifier": (None if reading.clarifier is None else
+                          self.card_json(reading.clarifier, "upright", width, fmt, "Clarifier")),
+            "final": (None if reading.final is None else
+                      self.card_json(reading.final, "upright", width, fmt, "Final")),
+        }
+
+    def card_image(self, name):
+        key = self.variants.get(name)
+        if key is None:
+            return None
+        return self.images.get(*key)
+
+    def spread_image(self, query):
+        try:
+            card_ids = [int(value) for value in query.get("ids", [""])[0].split(",")]
+            flags = [int(value) for value in query.get("reversed", [""])[0].split(",") if value]
+        except ValueError:
+            raise BadRequest("ids and reversed must be comma separated integers") from None
+        if not 0 < len(card_ids) <= len(catalog):
+            raise BadRequest(f"ids must list between 1 and {len(catalog)} cards")
+        if any(not 0 <= card_id < len(catalog) for card_id in card_ids):
+            raise BadRequest(f"ids must be card IDs between 0 and {len(catalog) - 1}")
+        if not flags:
+            flags = [0] * len(card_ids)
+        if len(flags) != len(card_ids):
+            raise BadRequest("reversed must have one flag per card")
+        layout = query.get("layout", ["row"])[0]
+        if layout in spreads:
+            # A spread key lays the cards out in that spread's cells
+            if len(card_ids) > spreads[layout].size:
+                raise BadRequest(f"the {layout} spread has only {spreads[layout].size} positions")
+            layout = spreads[layout].cells(0, len(card_ids))
+        elif layout not in LAYOUTS:
+            raise BadRequest(f"layout must be one of {list(LAYOUTS) + list(spreads)}")
+        width = _int_param(query, "width", card_assets.DEFAULT_WIDTH)
+        if width not in card_assets.WIDTHS:
+            raise BadRequest(f"width must be one of {list(card_assets.WIDTHS)}")
+        orientations = ["reversed" if flag else "upright" for flag in flags]
+        try:
+            return self.spreads.get(card_ids, orientations, layout, width)
+        except (OSError, ValueError) as e:
+            # Pillow refuses canvases it cannot encode, e.g. beyond JPEG's size limit
+            raise BadRequest(f"cannot compose this spread: {e}") from None
+
+
+def _int_param(query, name, default):
+    values = query.get(name)
+    if not values:
+        return default
+    try:
+        return int(values[0])
+    except ValueError:
+        raise BadRequest(f"{name} must be an integer") from None
+
+
+def _response(status, body, content_type, keep_alive, extra_headers=()):
+    headers = [
+        f"HTTP/1.1 {status} {REASONS[status]}",
+        f"Content-Type: {content_type}",
+        f"Content-Length: {len(body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        *extra_headers,
+    ]
+    return ("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body
+
+
+def _json_response(status, payload, keep_alive):
+    body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return _response(status, body, "application/json", keep_alive)
+
+
+def handle_request(service, method, target, keep_alive):
+    """Return the full HTTP response bytes for one request."""
+    if method not in ("GET", "HEAD"):
+        return _json_response(405, {"error": "only GET is supported"}, keep_alive)
+    url = urlsplit(target)
+
+    if url.path == "/reading":
+        try:
+            payload = service.reading(parse_qs(url.query))
+        except BadRequest as e:
+            return _json_response(400, {"error": str(e)}, keep_alive)
+        return _json_response(200, payload, keep_alive)
+
+    if url.path.startswith("/cards/"):
+        name = url.path[len("/cards/"):]
+        data = service.card_image(name)
+        if data is None:
+            return _json_response(404, {"error": "unknown card image"}, keep_alive)
+        content_type = CONTENT_TYPES[name.rsplit(".", 1)[-1]]
+        # Names contain a content hash, so they never change
+        return _response(200, data, content_type, keep_alive,
+                         ["Cache-Control: public, max-age=31536000, immutable"])
+
+    if url.path == "/spread":
+        try:
+            data = service.spread_image(parse_qs(url.query))
+        except BadRequest as e:
+            return _json_response(400, {"error": str(e)}, keep_alive)
+        # The query fully determines the image
+        return _response(200, data, CONTENT_TYPES["jpg"], keep_alive,
+                         ["Cache-Control: public, max-age=31536000, immutable"])
+
+    if url.path == "/spreads":
+        payload = {
+            key: {
+                "title": spread.title,
+                "cards": spread.size,
+                "labels": [position.label for position in spread.positions],
+                "clarifier": spread.clarifier,
+                "final": spread.final,
+                "card_width": spread.card_width,
+            }
+            for key, spread in spreads.items()
+        }
+        return _json_response(200, payload, keep_alive)
+
+    if url.path == "/metrics":
+        body = metrics.render_prometheus().encode("utf-8")
+        return _response(200, body, "text/plain; version=0.0.4", keep_alive)
+
+    if url.path == "/healthz":
+        return _json_response(200, {"status": "ok", "cards": len(catalog)}, keep_alive)
+
+    return _json_response(404, {"error": "not found"}, keep_alive)
+
+
+async def handle_connection(service, reader, writer):
+    try:
+        while True:
+            try:
+                head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEPALIVE_TIMEOUT)
+            except asyncio.LimitOverrunError:
+                writer.write(_json_response(431, {"error": "headers too large"}, False))
+                break
+            except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                break
+
+            lines = head.decode("latin-1").split("\r\n")
+            try:
+                method, target, version = lines[0].split(" ", 2)
+            except ValueError:
+                writer.write(_json_response(400, {"error": "malformed request line"}, False))
+                break
+            headers = {}
+            for line in lines[1:]:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            connection = headers.get("connection", "").lower()
+            keep_alive = connection != "close" and (version == "HTTP/1.1" or connection == "keep-alive")
+
+            # Requests are GET only; drain any body so the next request parses cleanly
+            try:
+                length = int(headers.get("content-length", 0) or 0)
+            except ValueError:
+                length = -1
+            if length < 0:
+                writer.write(_json_response(400, {"error": "invalid Content-Length"}, False))
+                break
+            if length > MAX_BODY_BYTES:
+                writer.write(_json_response(413, {"error": "request body too large"}, False))
+                break
+            if length:
+                await reader.readexactly(length)
+
+            with metrics.timer("request"):
+                try:
+                    if urlsplit(target).path in BLOCKING_PATHS:
+                        loop = asyncio.get_running_loop()
+                        response = await loop.run_in_executor(
+                            None, handle_request, service, method, target, keep_alive)
+                    else:
+                        response = handle_request(service, method, target, keep_alive)
+                except Exception:
+                    # e.g. an unreadable asset; answer rather than drop the connection
+                    logger.exception("error handling %s %s", method, target)
+                    metrics.count("request_errors")
+                    keep_alive = False
+                    response = _json_response(500, {"error": "internal error"}, keep_alive)
+            if method == "HEAD":
+                response = response[:response.index(b"\r\n\r\n") + 4]
+            writer.write(response)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host, port, reuse_port=False, shared=False):
+    if shared:
+        images = SharedAssets()
+        service = ReadingService(images.manifest, images)
+    else:
+        service = ReadingService(card_assets.load_manifest())
+    server = await asyncio.start_server(
+        lambda r, w: handle_connection(service, r, w),
+        host, port, limit=MAX_HEADER_BYTES, reuse_port=reuse_port, backlog=1024)
+    async with server:
+        await server.serve_forever()
+
+
+def _run_worker(host, port, reuse_port, shared=False):
+    try:
+        asyncio.run(serve(host, port, reuse_port, shared))
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve tarot readings over HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=1, help="worker processes sharing the port")
+    args = parser.parse_args()
+
+    if args.workers == 1:
+        # Build once up front so the worker only reads the manifest
+        manifest = card_assets.build_assets()
+        print(f"serving {len(manifest['cards'])} card images on http://{args.host}:{args.port}")
+        _run_worker(args.host, args.port, False)
+        return
+
+    # Workers attach to one read-only pack instead of caching images privately
+    pack = ensure_pack()
+    print(f"serving {len(pack.manifest['cards'])} card images on http://{args.host}:{args.port} "
+          f"with {args.workers} workers sharing {pack.path}")
+    pack.close()
+    workers = [
+        multiprocessing.Process(target=_run_worker, args=(args.host, args.port, True, True))
+        for _ in range(args.workers)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.terminate()
+
+
+if __name__ == "__main__":
+    main()
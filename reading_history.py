@@ -0,0 +1,495 @@
+"""Persistent, append-only reading history.
+
+Every reading is stored as one fixed-width 32-byte record::
+
+    timestamp   int64   milliseconds since the epoch
+    seed        uint64  draw_engine seed, enough to replay the whole deck
+    spread      uint8   number of spread cards
+    clarifier   uint8   card ID, or NO_CARD
+    final       uint8   card ID, or NO_CARD
+    flags       uint8   FLAG_TRUNCATED when the spread has more than MAX_CARDS cards
+    reversed    uint16  bit i set when spread card i is reversed
+    cards       10 x uint8 spread card IDs, NO_CARD padded
+
+Records are buffered and written in batches to ``readings.bin``, which is
+read back through a memory map. Timestamps are kept non-decreasing on
+append, so the record file is its own date index (binary search on the
+timestamp column). Two derived indexes sit next to it and are brought up to
+date after every batch:
+
+* ``counts.bin``: per-card totals (upright, reversed, clarifier, final) and
+  the number of records they cover;
+* ``by_card/<id>.idx``: record numbers of the readings a card appeared in.
+
+Truncated records hold only their first MAX_CARDS cards, so their spread
+cards are left out of both indexes rather than counted as if the spread had
+stopped there; their clarifier and final cards are still counted.
+
+If a writer dies between appending records and updating the indexes, the
+next writer truncates the postings back to the covered record count and
+rebuilds the rest from the record file. A writer that dies part way through
+a record leaves a torn tail; it is cut off before the next batch is
+appended, so later records stay aligned.
+"""
+import argparse
+import atexit
+import fcntl
+import os
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+import metrics
+from card_catalog import catalog
+
+
+# Constants
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_DIR = os.environ.get("TAROT_HISTORY_DIR", os.path.join(BASE_DIR, ".reading_history"))
+RECORDS_NAME = "readings.bin"
+COUNTS_NAME = "counts.bin"
+POSTINGS_DIR = "by_card"
+LOCK_NAME = "lock"
+
+MAGIC = b"TAROTHST"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sII")   # magic, format version, record size
+
+MAX_CARDS = 10
+NO_CARD = 0xFF
+FLAG_TRUNCATED = 0x01
+
+RECORD = np.dtype([
+    ("timestamp", "<i8"),
+    ("seed", "<u8"),
+    ("spread", "u1"),
+    ("clarifier", "u1"),
+    ("final", "u1"),
+    ("flags", "u1"),
+    ("reversed", "<u2"),
+    ("cards", "u1", (MAX_CARDS,)),
+])
+POSTING = np.dtype("<u4")
+
+# Columns of the per-card counts index
+COUNT_COLUMNS = ("upright", "reversed", "clarifier", "final")
+COUNTS_HEADER = struct.Struct("<8sIIQ")   # magic, counts version, deck size, records covered
+# Version 2 leaves the spread cards of truncated records out; older files are rebuilt
+COUNTS_VERSION = 2
+
+# Buffered records are written once this many are pending, or after FLUSH_INTERVAL seconds
+BATCH_SIZE = 64
+FLUSH_INTERVAL = float(os.environ.get("TAROT_HISTORY_FLUSH_INTERVAL", 2.0))
+INDEX_CHUNK = 1 << 20
+
+
+@dataclass(frozen=True, slots=True)
+class SavedReading:
+    """One reading decoded from the history store."""
+
+    number: Optional[int]   # record number, None while still buffered
+    timestamp: float        # seconds since the epoch
+    seed: int
+    spread_size: int
+    cards: tuple
+    orientations: tuple
+    clarifier: Optional[int]
+    final: Optional[int]
+    truncated: bool
+
+
+def encode(seed, spread_size, cards, orientations, clarifier=None, final=None, timestamp=None):
+    """Pack one reading into a RECORD scalar."""
+    record = np.zeros((), dtype=RECORD)
+    record["timestamp"] = round((time.time() if timestamp is None else timestamp) * 1000)
+    record["seed"] = seed
+    record["spread"] = spread_size
+    record["clarifier"] = NO_CARD if clarifier is None else clarifier
+    record["final"] = NO_CARD if final is None else final
+    record["flags"] = FLAG_TRUNCATED if len(cards) > MAX_CARDS else 0
+    kept = list(cards[:MAX_CARDS])
+    record["cards"] = kept + [NO_CARD] * (MAX_CARDS - len(kept))
+    record["reversed"] = sum(1 << i for i, o in enumerate(orientations[:MAX_CARDS]) if o == "reversed")
+    return record
+
+
+def decode(record, number=None):
+    spread_size = int(record["spread"])
+    kept = min(spread_size, MAX_CARDS)
+    mask = int(record["reversed"])
+    clarifier = int(record["clarifier"])
+    final = int(record["final"])
+    return SavedReading(
+        number=number,
+        timestamp=int(record["timestamp"]) / 1000,
+        seed=int(record["seed"]),
+        spread_size=spread_size,
+        cards=tuple(int(card_id) for card_id in record["cards"][:kept]),
+        orientations=tuple("reversed" if mask >> i & 1 else "upright" for i in range(kept)),
+        clarifier=None if clarifier == NO_CARD else clarifier,
+        final=None if final == NO_CARD else final,
+        truncated=bool(record["flags"] & FLAG_TRUNCATED),
+    )
+
+
+def _indexed_cards(records):
+    """Spread card IDs and a mask of the ones the indexes cover."""
+    cards = records["cards"]
+    complete = (records["flags"] & FLAG_TRUNCATED) == 0
+    return cards, (cards != NO_CARD) & complete[:, None]
+
+
+def _card_counts(records):
+    """Per-card (upright, reversed, clarifier, final) counts for a record array."""
+    counts = np.zeros((len(catalog), len(COUNT_COLUMNS)), dtype=np.int64)
+    if not len(records):
+        return counts
+    cards, present = _indexed_cards(records)
+    bits = (records["reversed"][:, None] >> np.arange(MAX_CARDS, dtype=np.uint16)) & 1
+    ids = cards[present].astype(np.intp)
+    flips = bits[present].astype(bool)
+    counts[:, 0] = np.bincount(ids[~flips], minlength=len(catalog))
+    counts[:, 1] = np.bincount(ids[flips], minlength=len(catalog))
+    for column, field in ((2, "clarifier"), (3, "final")):
+        drawn = records[field][records[field] != NO_CARD].astype(np.intp)
+        counts[:, column] = np.bincount(drawn, minlength=len(catalog))
+    return counts
+
+
+class ReadingHistory:
+    """Append-only reading store shared by every session in a process.
+
+    Safe across threads, and across processes through an advisory file lock
+    held while a batch and its index updates are written.
+    """
+
+    def __init__(self, path=HISTORY_DIR, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.records_path = os.path.join(path, RECORDS_NAME)
+        self.counts_path = os.path.join(path, COUNTS_NAME)
+        self.postings_dir = os.path.join(path, POSTINGS_DIR)
+        self._lock = threading.Lock()
+        self._pending = []
+        self._timer = None
+        self._map = None
+        self._map_size = -1
+        self._counts = None
+        self._counts_mtime = -1
+
+        os.makedirs(self.postings_dir, exist_ok=True)
+        with self._file_lock():
+            self._ensure_header()
+            self._update_indexes()
+        atexit.register(self.flush)
+
+    # Writing
+
+    def append(self, seed, spread_size, cards, orientations, clarifier=None, final=None,
+               timestamp=None):
+        """Buffer one reading; it is written with the next batch."""
+        record = encode(seed, spread_size, cards, orientations, clarifier, final, timestamp)
+        with self._lock:
+            self._pending.append(record)
+            full = len(self._pending) >= self.batch_size
+            if not full and self._timer is None and self.flush_interval:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        metrics.count("history_appends")
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write every buffered reading and bring the indexes up to date."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not pending:
+            return 0
+        batch = np.array(pending, dtype=RECORD)
+        with metrics.timer("history_flush"), self._file_lock():
+            self._drop_torn_tail()
+            records = self._records()
+            last = int(records["timestamp"][-1]) if len(records) else np.iinfo(np.int64).min
+            # Keep the file sorted by time even if the clock steps back
+            batch["timestamp"] = np.maximum.accumulate(np.maximum(batch["timestamp"], last))
+            with open(self.records_path, "ab") as f:
+                f.write(batch.tobytes())
+            self._update_indexes(appended=len(batch))
+        metrics.count("history_records_written", len(batch))
+        return len(batch)
+
+    # Reading
+
+    def __len__(self):
+        with self._lock:
+            pending = len(self._pending)
+        return len(self._records()) + pending
+
+    def recent(self, n=10):
+        """Return the last ``n`` readings, newest first, including buffered ones."""
+        with self._lock:
+            pending = list(self._pending)
+        readings = [decode(record) for record in reversed(pending[-n:])]
+        if len(readings) < n:
+            records = self._records()
+            start = max(0, len(records) - (n - len(readings)))
+            for number in range(len(records) - 1, start - 1, -1):
+                readings.append(decode(records[number], number))
+        return readings
+
+    def with_seeds(self, seeds, since=0, n=10):
+        """Return the last ``n`` readings drawn from ``seeds`` since ``since``, newest first.
+
+        Lets a caller list only its own readings: seeds are 64-bit and fresh
+        per reading, and ``since`` limits the scan to the timestamp range
+        they can have been saved in.
+        """
+        seeds = np.array(list(seeds), dtype=np.uint64)
+        with self._lock:
+            pending = [record for record in self._pending if record["seed"] in seeds]
+        readings = [decode(record) for record in reversed(pending[-n:])]
+        if len(readings) < n and len(seeds):
+            records = self._records()
+            first = int(np.searchsorted(records["timestamp"], round(since * 1000), side="left"))
+            numbers = np.flatnonzero(np.isin(records["seed"][first:], seeds)) + first
+            for number in numbers[::-1][:n - len(readings)]:
+                readings.append(decode(records[number], int(number)))
+        return readings
+
+    def between(self, start, end=None):
+        """Return the readings with ``start <= timestamp < end`` (epoch seconds)."""
+        records = self._records()
+        times = records["timestamp"]
+        first = int(np.searchsorted(times, round(start * 1000), side="left"))
+        last = len(records) if end is None else int(np.searchsorted(times, round(end * 1000), side="left"))
+        return [decode(records[number], number) for number in range(first, last)]
+
+    def count_between(self, start, end=None):
+        records = self._records()
+        times = records["timestamp"]
+        first = np.searchsorted(times, round(start * 1000), side="left")
+        last = len(records) if end is None else np.searchsorted(times, round(end * 1000), side="left")
+        return int(last - first)
+
+    def with_card(self, card_id, n=10):
+        """Return the last ``n`` written, untruncated readings that had ``card_id`` in the spread."""
+        postings = self._postings(card_id)
+        records = self._records()
+        end = int(np.searchsorted(postings, len(records)))
+        numbers = postings[max(0, end - n):end][::-1]
+        return [decode(records[number], int(number)) for number in numbers]
+
+    def card_counts(self):
+        """Return a (deck size, 4) array of upright, reversed, clarifier, final counts."""
+        with self._lock:
+            pending = np.array(self._pending, dtype=RECORD)
+        counts = self._load_counts().copy()
+        if len(pending):
+            counts += _card_counts(pending)
+        return counts
+
+    def card_frequencies(self, top=None):
+        """Return [(card ID, times drawn in a spread)] ordered by frequency."""
+        counts = self.card_counts()
+        drawn = counts[:, 0] + counts[:, 1]
+        order = np.argsort(-drawn, kind="stable")
+        if top is not None:
+            order = order[:top]
+        return [(int(card_id), int(drawn[card_id])) for card_id in order]
+
+    # Storage
+
+    def _file_lock(self):
+        return _FileLock(os.path.join(self.path, LOCK_NAME))
+
+    def _ensure_header(self):
+        try:
+            with open(self.records_path, "rb") as f:
+                header = f.read(HEADER.size)
+        except FileNotFoundError:
+            header = b""
+        if not header:
+            with open(self.records_path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, FORMAT_VERSION, RECORD.itemsize))
+            return
+        magic, version, size = HEADER.unpack(header)
+        if magic != MAGIC or version != FORMAT_VERSION or size != RECORD.itemsize:
+            raise ValueError(f"{self.records_path} is not a version {FORMAT_VERSION} reading history")
+
+    def _drop_torn_tail(self):
+        """Cut off a partial record left by an interrupted write. Call with the file lock held."""
+        size = os.path.getsize(self.records_path)
+        if size <= HEADER.size:
+            return
+        whole = HEADER.size + (size - HEADER.size) // RECORD.itemsize * RECORD.itemsize
+        if whole != size:
+            with open(self.records_path, "r+b") as f:
+                f.truncate(whole)
+            metrics.count("history_torn_writes")
+
+    def _records(self):
+        """Memory-mapped view of every complete record on disk."""
+        size = os.path.getsize(self.records_path)
+        if size != self._map_size:
+            count = (size - HEADER.size) // RECORD.itemsize
+            if count > 0:
+                self._map = np.memmap(self.records_path, dtype=RECORD, mode="r",
+                                      offset=HEADER.size, shape=(count,))
+            else:
+                self._map = np.zeros(0, dtype=RECORD)
+            self._map_size = size
+        return self._map
+
+    def _postings_path(self, card_id):
+        return os.path.join(self.postings_dir, f"{card_id:02d}.idx")
+
+    def _postings(self, card_id):
+        path = self._postings_path(card_id)
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return np.zeros(0, dtype=POSTING)
+        count = size // POSTING.itemsize
+        if not count:
+            return np.zeros(0, dtype=POSTING)
+        return np.memmap(path, dtype=POSTING, mode="r", shape=(count,))
+
+    def _read_counts_file(self):
+        try:
+            with open(self.counts_path, "rb") as f:
+                data = f.read()
+            magic, version, deck_size, covered = COUNTS_HEADER.unpack_from(data)
+        except (OSError, struct.error):
+            return None, 0
+        if magic != MAGIC or version != COUNTS_VERSION or deck_size != len(catalog):
+            return None, 0
+        counts = np.frombuffer(data, dtype="<i8", offset=COUNTS_HEADER.size)
+        return counts.reshape(len(catalog), len(COUNT_COLUMNS)).copy(), covered
+
+    def _load_counts(self):
+        try:
+            mtime = os.stat(self.counts_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if self._counts is None or mtime != self._counts_mtime:
+            counts, _ = self._read_counts_file()
+            self._counts = counts if counts is not None else _card_counts(self._records())
+            self._counts_mtime = mtime
+        return self._counts
+
+    def _update_indexes(self, appended=0):
+        """Index every record past the covered count. Call with the file lock held.
+
+        ``appended`` is the number of records this writer just added; any
+        other uncovered records were left by a writer that was interrupted.
+        """
+        self._drop_torn_tail()
+        records = self._records()
+        counts, covered = self._read_counts_file()
+        if counts is not None and covered == len(records):
+            return
+        if counts is None or covered > len(records):
+            counts, covered = np.zeros((len(catalog), len(COUNT_COLUMNS)), dtype=np.int64), 0
+
+        # Postings past the covered count may be left over from an interrupted batch
+        interrupted = covered + appended != len(records)
+        for card_id in range(len(catalog) if interrupted else 0):
+            postings = self._postings(card_id)
+            keep = int(np.searchsorted(postings, covered))
+            if keep < len(postings):
+                del postings
+                with open(self._postings_path(card_id), "r+b") as f:
+                    f.truncate(keep * POSTING.itemsize)
+
+        for start in range(covered, len(records), INDEX_CHUNK):
+            chunk = records[start:start + INDEX_CHUNK]
+            counts += _card_counts(chunk)
+            cards, present = _indexed_cards(chunk)
+            numbers = np.broadcast_to(np.arange(start, start + len(chunk), dtype=POSTING)[:, None],
+                                      cards.shape)
+            ids = cards[present]
+            numbers = numbers[present]
+            order = np.argsort(ids, kind="stable")
+            ids, numbers = ids[order], numbers[order]
+            bounds = np.searchsorted(ids, np.arange(len(catalog) + 1))
+            for card_id in range(len(catalog)):
+                lo, hi = bounds[card_id], bounds[card_id + 1]
+                if lo < hi:
+                    with open(self._postings_path(card_id), "ab") as f:
+                        f.write(numbers[lo:hi].tobytes())
+
+        tmp = f"{self.counts_path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(COUNTS_HEADER.pack(MAGIC, COUNTS_VERSION, len(catalog), len(records)))
+            f.write(counts.astype("<i8").tobytes())
+        os.replace(tmp, self.counts_path)
+
+
+class _FileLock:
+    """Exclusive advisory lock on a file, for writers in other processes."""
+
+    __slots__ = ("path", "fd")
+
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+        return False
+
+
+def _format_reading(reading):
+    when = time.strftime("%Y-%m-%d %H:%M", time.localtime(reading.timestamp))
+    cards = ", ".join(
+        catalog[card_id].title + (" (R)" if orientation == "reversed" else "")
+        for card_id, orientation in zip(reading.cards, reading.orientations)
+    )
+    return f"{when}  seed {reading.seed:<20}  {cards}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the saved reading history.")
+    parser.add_argument("--path", default=HISTORY_DIR, help="history directory")
+    parser.add_argument("--recent", type=int, default=10, help="show the last N readings")
+    parser.add_argument("--card", help="only readings with this card (title or ID)")
+    parser.add_argument("--stats", type=int, metavar="N", help="show the N most drawn cards")
+    args = parser.parse_args()
+
+    history = ReadingHistory(args.path, flush_interval=0)
+    print(f"{len(history)} readings in {args.path}")
+    if args.card is not None:
+        if args.card.isdigit():
+            card_id = int(args.card)
+        else:
+            matches = [card.id for card in catalog if card.title.lower() == args.card.lower()]
+            if not matches:
+                parser.error(f"no card titled {args.card!r}")
+            card_id = matches[0]
+        readings = history.with_card(card_id, args.recent)
+    else:
+        readings = history.recent(args.recent)
+    for reading in readings:
+        print(_format_reading(reading))
+    if args.stats:
+        print()
+        for card_id, drawn in history.card_frequencies(args.stats):
+            print(f"{drawn:>10}  {catalog[card_id].title}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""Card assets packed into one file that every worker process maps read-only.
+
+``build_pack`` concatenates every rendered card variant into ``assets.pack``
+in the asset cache, followed by a JSON index holding the deck manifest and
+each variant's offset and length. Workers attach with ``SharedAssets``,
+which maps the file once with ``mmap``: the kernel keeps one copy of the
+pages in the page cache no matter how many processes read them, so running
+one worker per core does not multiply image memory the way a private
+``ImageCache`` per process does.
+
+The pack is replaced atomically when the deck changes. Workers that are
+already attached keep reading their mapping of the old file until they
+restart.
+
+Enable it with ``TAROT_SHARED_ASSETS=1`` for the Streamlit app; the reading
+API uses it whenever it runs more than one worker. ``python
+shared_assets.py`` builds the variants and the pack ahead of a deployment.
+"""
+import argparse
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+
+import card_assets
+import metrics
+
+
+# Constants
+PACK_NAME = "assets.pack"
+PACK_PATH = os.path.join(card_assets.CACHE_DIR, PACK_NAME)
+ENABLED = os.environ.get("TAROT_SHARED_ASSETS") == "1"
+MAGIC = b"TAROTPAK"
+PACK_VERSION = 1
+HEADER = struct.Struct("<8sIQQ")   # magic, pack version, index offset, index length
+
+
+def deck_digest(manifest):
+    """Hash of every card's source hash, identifying the deck a pack was built from."""
+    digest = hashlib.sha256()
+    for filename, entry in sorted(manifest["cards"].items()):
+        digest.update(f"{filename}:{entry['hash']}\n".encode("utf-8"))
+    digest.update(f"build:{card_assets.BUILD_VERSION}".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def build_pack(manifest, cache_dir=card_assets.CACHE_DIR, path=None):
+    """Write every variant in ``manifest`` into one pack file and return its path."""
+    path = path or os.path.join(cache_dir, PACK_NAME)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    slots = []
+    with metrics.timer("pack_build"), open(tmp, "wb") as out:
+        out.write(b"\0" * HEADER.size)
+        for filename, entry in sorted(manifest["cards"].items()):
+            for orientation, sizes in sorted(entry["variants"].items()):
+                for width, formats in sorted(sizes.items()):
+                    for fmt, name in sorted(formats.items()):
+                        with open(os.path.join(cache_dir, name), "rb") as f:
+                            data = f.read()
+                        slots.append([filename, orientation, int(width), fmt, out.tell(), len(data)])
+                        out.write(data)
+        index = json.dumps({
+            "digest": deck_digest(manifest),
+            "manifest": {"version": manifest["version"], "cards": manifest["cards"]},
+            "slots": slots,
+        }, separators=(",", ":")).encode("utf-8")
+        index_offset = out.tell()
+        out.write(index)
+        out.seek(0)
+        out.write(HEADER.pack(MAGIC, PACK_VERSION, index_offset, len(index)))
+    os.replace(tmp, path)
+    return path
+
+
+class SharedAssets:
+    """Read-only view of a pack file, mapped once per process.
+
+    Drop-in for ``ImageCache`` where the app and the API read card images:
+    ``get`` and ``fetch`` take the same keys, but nothing is copied into
+    private memory beyond the bytes handed to the caller.
+    """
+
+    def __init__(self, path=PACK_PATH):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, index_offset, index_length = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != PACK_VERSION:
+            self._map.close()
+            raise ValueError(f"{path} is not a version {PACK_VERSION} asset pack")
+        index = json.loads(self._map[index_offset:index_offset + index_length])
+        self.digest = index["digest"]
+        self.manifest = index["manifest"]
+        self.slots = {
+            (filename, orientation, width, fmt): (offset, length)
+            for filename, orientation, width, fmt, offset, length in index["slots"]
+        }
+
+    def view(self, filename, orientation="upright", width=card_assets.DEFAULT_WIDTH,
+             fmt=card_assets.DEFAULT_FORMAT):
+        """Zero-copy memoryview of one variant's encoded bytes."""
+        offset, length = self.slots[(filename, orientation, width, fmt)]
+        metrics.count("shared_asset_reads")
+        return memoryview(self._map)[offset:offset + length]
+
+    def get(self, filename, orientation="upright", width=card_assets.DEFAULT_WIDTH,
+            fmt=card_assets.DEFAULT_FORMAT):
+        return self.fetch((filename, orientation, width, fmt))
+
+    def fetch(self, key):
+        # st.image and Pillow want bytes; the copy is released with the response
+        return bytes(self.view(*key))
+
+    def __contains__(self, key):
+        return key in self.slots
+
+    def __len__(self):
+        return len(self.slots)
+
+    def close(self):
+        self._map.close()
+
+    def gauges(self, prefix="shared_assets_"):
+        """Stats as flat gauges, for ``metrics.add_collector``."""
+        return {prefix + name: value for name, value in self.stats().items()}
+
+    def stats(self):
+        return {
+            "entries": len(self.slots),
+            "mapped_bytes": len(self._map),
+        }
+
+
+def ensure_pack(image_dir=card_assets.IMAGE_DIR, cache_dir=card_assets.CACHE_DIR):
+    """Attach to the pack for the current deck, building it first if needed.
+
+    Safe to call from many workers starting at once: one builds under a file
+    lock while the others wait and then attach to the finished pack.
+    """
+    path = os.path.join(cache_dir, PACK_NAME)
+    os.makedirs(cache_dir, exist_ok=True)
+    digest = deck_digest(card_assets.load_deck(image_dir, cache_dir))
+    fd = os.open(f"{path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            shared = SharedAssets(path)
+        except (OSError, ValueError):
+            shared = None
+        if shared is not None and shared.digest == digest:
+            return shared
+        if shared is not None:
+            shared.close()
+        manifest = card_assets.build_assets(image_dir, cache_dir)
+        build_pack(manifest, cache_dir, path)
+        return SharedAssets(path)
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the shared card asset pack.")
+    parser.add_argument("--images", default=card_assets.IMAGE_DIR, help="source PNG directory")
+    parser.add_argument("--cache", default=card_assets.CACHE_DIR, help="asset cache directory")
+    args = parser.parse_args()
+
+    shared = ensure_pack(args.images, args.cache)
+    print(f"{len(shared)} variants, {shared.stats()['mapped_bytes'] / 1e6:.1f} MB in {shared.path}")
+
+
+if __name__ == "__main__":
+    main()
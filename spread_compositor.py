@@ -0,0 +1,100 @@
+"""Render a page of a spread into one pre-sized image.
+
+Used for thumbnail spreads, where a page holds dozens of cards: one
+``st.image`` payload per page instead of one per card, and for spreads with
+their own cell layout, which Streamlit columns cannot place. Other small
+spreads are better served by passing each card's cached JPEG through
+untouched, since a composite costs a decode and an encode on every new
+reading and random spreads rarely repeat.
+
+Cards are pasted from their lossless PNG variants so the composite is only
+JPEG-encoded once. Composites are kept in their own process-wide LRU cache
+keyed by (card IDs, orientations, layout, width).
+"""
+import io
+import os
+
+import card_assets
+import metrics
+from card_catalog import catalog
+from image_cache import ImageCache
+
+
+# Constants
+GAP = 12
+BACKGROUND = (255, 255, 255)
+QUALITY = 88
+GRID_COLUMNS = 5
+# Source variants are lossless so the composite is the only lossy encode
+PART_FORMAT = "png"
+LAYOUTS = ("row", "grid")
+DEFAULT_MAX_BYTES = int(os.environ.get("TAROT_SPREAD_CACHE_BYTES", 32 * 1024 * 1024))
+
+
+def layout_positions(layout, count, card_width, card_height, gap=GAP):
+    """Return the canvas size and the top-left corner of each card.
+
+    ``layout`` is a name from LAYOUTS or a tuple of (column, row) cells, one
+    per card, in card widths and heights; fractional cells are allowed.
+    """
+    if isinstance(layout, tuple):
+        if len(layout) != count:
+            raise ValueError(f"expected {count} layout cells, got {len(layout)}")
+        positions = [
+            (round(column * (card_width + gap)), round(row * (card_height + gap)))
+            for column, row in layout
+        ]
+        size = (max(x for x, _ in positions) + card_width, max(y for _, y in positions) + card_height)
+        return size, positions
+    if layout == "row":
+        columns = count
+    elif layout == "grid":
+        columns = min(count, GRID_COLUMNS)
+    else:
+        raise ValueError(f"unknown layout {layout!r}, expected one of {LAYOUTS}")
+    rows = -(-count // columns)
+    size = (columns * card_width + (columns - 1) * gap, rows * card_height + (rows - 1) * gap)
+    positions = [
+        ((i % columns) * (card_width + gap), (i // columns) * (card_height + gap))
+        for i in range(count)
+    ]
+    return size, positions
+
+
+def compose(images, layout="row", gap=GAP, background=BACKGROUND, quality=QUALITY):
+    """Paste encoded card images into one JPEG and return its bytes."""
+    from PIL import Image
+
+    with metrics.timer("spread_decode"):
+        cards = [Image.open(io.BytesIO(data)) for data in images]
+        for card in cards:
+            card.load()
+    card_width = max(card.width for card in cards)
+    card_height = max(card.height for card in cards)
+    size, positions = layout_positions(layout, len(cards), card_width, card_height, gap)
+
+    canvas = Image.new("RGB", size, background)
+    for card, position in zip(cards, positions):
+        canvas.paste(card, position)
+    buf = io.BytesIO()
+    with metrics.timer("spread_encode"):
+        canvas.save(buf, format="JPEG", quality=quality, optimize=True)
+    return buf.getvalue()
+
+
+class SpreadCompositor:
+    """Builds and caches spread composites from a card ImageCache."""
+
+    def __init__(self, images, max_bytes=DEFAULT_MAX_BYTES):
+        self.images = images
+        self.cache = ImageCache(self._render, max_bytes)
+
+    def get(self, card_ids, orientations, layout="row", width=card_assets.DEFAULT_WIDTH):
+        return self.cache.fetch((tuple(card_ids), tuple(orientations), layout, width))
+
+    def _render(self, card_ids, orientations, layout, width):
+        parts = [
+            self.images.get(catalog[card_id].filename, orientation, width, PART_FORMAT)
+            for card_id, orientation in zip(card_ids, orientations)
+        ]
+        return compose(parts, layout)
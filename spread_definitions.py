@@ -0,0 +1,56 @@
+spread_definitions = {
+
+    "single": {
+        "title": "Single card",
+        "positions": [{"label": None}],
+        "reversals": 0.3,
+        "clarifier": True,
+        "final": True,
+    },
+
+    "three_card": {
+        "title": "Past, Present, Future",
+        "positions": [{"label": "Past"}, {"label": "Present"}, {"label": "Future"}],
+        "reversals": 0.0,
+        "clarifier": True,
+        "final": True,
+    },
+
+    # The cross on the left, the staff of four read bottom to top on the right.
+    # Cells are (column, row) in card widths and heights.
+    "celtic_cross": {
+        "title": "Celtic Cross",
+        "layout": "cells",
+        "positions": [
+            {"label": "Present", "cell": (1, 1)},
+            {"label": "Challenge", "cell": (2, 1)},
+            {"label": "Foundation", "cell": (1.5, 2)},
+            {"label": "Recent Past", "cell": (0, 1)},
+            {"label": "Crown", "cell": (1.5, 0)},
+            {"label": "Near Future", "cell": (3, 1)},
+            {"label": "Self", "cell": (4.5, 3)},
+            {"label": "Environment", "cell": (4.5, 2)},
+            {"label": "Hopes and Fears", "cell": (4.5, 1)},
+            {"label": "Outcome", "cell": (4.5, 0)},
+        ],
+        "reversals": 0.3,
+        "clarifier": True,
+        "final": True,
+    },
+
+    # Every card in the deck, shown as thumbnails a page at a time and revealed a row per click
+    "full_deck": {
+        "title": "Full deck",
+        "count": 78,
+        "label": "Card {number}",
+        "layout": "grid",
+        "columns": 13,
+        "card_width": 100,
+        "page_size": 26,
+        "reveal": 13,
+        "reversals": 0.3,
+        "clarifier": False,
+        "final": False,
+    },
+
+}
@@ -0,0 +1,187 @@
+"""Spreads built from the declarative definitions in ``spread_definitions``.
+
+A definition lists its positions (label, optional layout cell and
+orientation rule) or gives a ``count`` and a label template, plus whether a
+clarifier and a final card can be drawn after the spread. Keys::
+
+    title        display name
+    positions    [{"label": str | None, "cell": (column, row), "orientation": rule}]
+    count        number of positions, when they are generated from "label"
+    label        label template for generated positions, e.g. "Card {number}"
+    layout       "row" (default), "grid" (wrapped at "columns") or "cells"
+    columns      cards per row for the grid layout
+    reversals    chance of a reversal for positions with the "random" rule
+    clarifier    whether the next card can be drawn as a clarifier
+    final        whether the bottom card can be revealed as the final card
+    card_width   image width the spread is shown at; small for large spreads
+    page_size    cards shown at once; later cards are only loaded when paged to
+    reveal       cards revealed per click, the whole spread by default
+
+Orientation rules are "random" (the default), "upright" and "reversed".
+Drawing uses ``draw_engine.draw_batch`` with one reversal rate per position,
+so a spread reading is still reproducible from its seed and index.
+"""
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+
+import card_assets
+import draw_engine
+from card_catalog import catalog
+from spread_definitions import spread_definitions
+
+
+# Constants
+LAYOUTS = ("row", "grid", "cells")
+ORIENTATION_RULES = ("random", "upright", "reversed")
+DEFAULT_PAGE_SIZE = 26
+
+
+class SpreadError(Exception):
+    """Raised when a spread definition is invalid."""
+
+
+@dataclass(frozen=True, slots=True)
+class Position:
+    index: int
+    label: Optional[str]
+    cell: tuple            # (column, row) in card widths and heights
+    reversal_rate: float
+
+
+@dataclass(frozen=True, slots=True)
+class SpreadReading:
+    """One drawn spread as plain Python values."""
+    spread: "Spread"
+    seed: int
+    index: int
+    order: list            # the whole shuffled deck as card IDs
+    cards: list            # card IDs in position order
+    orientations: list     # "upright"/"reversed" per position
+    clarifier: Optional[int]
+    final: Optional[int]
+
+
+@dataclass(frozen=True, slots=True)
+class Spread:
+    key: str
+    title: str
+    layout: str
+    positions: tuple
+    clarifier: bool
+    final: bool
+    card_width: int
+    page_size: int
+    reveal: int
+
+    @property
+    def size(self):
+        return len(self.positions)
+
+    @property
+    def columns(self):
+        """Most positions sharing a layout row: how many cards wide the spread is."""
+        return max(Counter(position.cell[1] for position in self.positions).values())
+
+    @property
+    def reversal_rates(self):
+        return tuple(position.reversal_rate for position in self.positions)
+
+    def draw(self, seed=None, index=0):
+        if seed is None:
+            seed = draw_engine.new_seed()
+        readings = draw_engine.draw_batch(1, self.size, seed, start=index,
+                                          reversal_rate=self.reversal_rates)
+        order = readings.order[0].tolist()
+        clarifier = int(readings.clarifier[0])
+        final = int(readings.final[0])
+        return SpreadReading(
+            spread=self,
+            seed=seed,
+            index=index,
+            order=order,
+            cards=order[:self.size],
+            orientations=["reversed" if r else "upright" for r in readings.reversed[0]],
+            clarifier=clarifier if self.clarifier and clarifier != draw_engine.NO_CARD else None,
+            final=final if self.final and final != draw_engine.NO_CARD else None,
+        )
+
+    def cells(self, start=0, stop=None):
+        """Layout cells of positions ``start:stop``, shifted to start at (0, 0)."""
+        cells = [position.cell for position in self.positions[start:stop]]
+        left = min(column for column, _ in cells)
+        top = min(row for _, row in cells)
+        return tuple((column - left, row - top) for column, row in cells)
+
+
+def _orientation_rate(rule, reversals, key):
+    if rule not in ORIENTATION_RULES:
+        raise SpreadError(f"{key}: orientation must be one of {ORIENTATION_RULES}, not {rule!r}")
+    if rule == "upright":
+        return 0.0
+    if rule == "reversed":
+        return 1.0
+    return reversals
+
+
+def load_spread(key, definition):
+    """Validate one definition and build its Spread."""
+    reversals = definition.get("reversals", 0.0)
+    if not 0.0 <= reversals <= 1.0:
+        raise SpreadError(f"{key}: reversals must be between 0 and 1")
+    layout = definition.get("layout", "row")
+    if layout not in LAYOUTS:
+        raise SpreadError(f"{key}: layout must be one of {LAYOUTS}, not {layout!r}")
+
+    if "positions" in definition:
+        specs = definition["positions"]
+    else:
+        template = definition.get("label", "{number}")
+        specs = [{"label": template.format(number=i + 1)} for i in range(definition.get("count", 0))]
+    if not 0 < len(specs) <= len(catalog):
+        raise SpreadError(f"{key}: a spread needs between 1 and {len(catalog)} positions")
+
+    columns = definition.get("columns", len(specs)) if layout == "grid" else len(specs)
+    positions = []
+    for i, spec in enumerate(specs):
+        if layout == "cells":
+            if "cell" not in spec:
+                raise SpreadError(f"{key}: position {i + 1} has no cell")
+            cell = tuple(spec["cell"])
+        else:
+            cell = (i % columns, i // columns)
+        positions.append(Position(
+            index=i,
+            label=spec.get("label"),
+            cell=cell,
+            reversal_rate=_orientation_rate(spec.get("orientation", "random"), reversals, key),
+        ))
+
+    card_width = definition.get("card_width", card_assets.DEFAULT_WIDTH)
+    if card_width not in card_assets.WIDTHS:
+        raise SpreadError(f"{key}: card_width must be one of {card_assets.WIDTHS}")
+    page_size = definition.get("page_size", DEFAULT_PAGE_SIZE)
+    reveal = definition.get("reveal", len(positions))
+    if page_size < 1 or reveal < 1:
+        raise SpreadError(f"{key}: page_size and reveal must be positive")
+
+    return Spread(
+        key=key,
+        title=definition.get("title", key),
+        layout=layout,
+        positions=tuple(positions),
+        clarifier=definition.get("clarifier", False),
+        final=definition.get("final", False),
+        card_width=card_width,
+        page_size=page_size,
+        reveal=reveal,
+    )
+
+
+def load_spreads(definitions):
+    return {key: load_spread(key, definition) for key, definition in definitions.items()}
+
+
+spreads = load_spreads(spread_definitions)
+# The first spread of each size, for callers that only give a card count
+spreads_by_size = {spread.size: spread for spread in reversed(list(spreads.values()))}
@@ -1,9 +1,22 @@
-import streamlit as st
-import random
-from PIL import Image
-import os
 import time
-from card_metadata import card_metadata
+
+# Taken before the other imports, so the first run in a process counts loading them
+run_started = time.perf_counter()
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import streamlit as st
+from card_catalog import catalog
+import card_assets
+import metrics
+from image_cache import ImageCache, read_asset
+from reading_history import ReadingHistory
+import shared_assets
+from spread_engine import spreads
+from spread_compositor import PART_FORMAT, SpreadCompositor
 
 
 # Constants
@@ -11,12 +24,98 @@ DAY = 21
 MONTH = 5
 YEAR = 1983
 
+PREFETCH_WORKERS = 4
+
+# How many past readings and most-drawn cards the sidebar lists
+HISTORY_SHOWN = 5
+
+# Set TAROT_WARM_ASSETS=1 to render every card variant in the background at startup
+WARM_ASSETS = os.environ.get("TAROT_WARM_ASSETS") == "1"
+
+logger = logging.getLogger(__name__)
+metrics.begin_trace()
+metrics.count("reruns")
+
 st.set_page_config(page_title="Tarot Card Reader", layout="wide")
 st.title("🔮 Tarot Card Reader")
 
-# Load images
-image_dir = "images"
-deck = [f for f in os.listdir(image_dir) if f.endswith(".png")]
+
+@st.cache_resource
+def get_shared_assets():
+    # TAROT_SHARED_ASSETS=1: card images come from one pack mapped by every worker process
+    return shared_assets.ensure_pack()
+
+
+@st.cache_resource
+def get_asset_manifest():
+    if shared_assets.ENABLED:
+        return get_shared_assets().manifest
+    # Deck manifest only: one stat per card, no decoding and no Pillow import.
+    # Missing variants are rendered on the first cache miss for that card.
+    manifest = card_assets.load_deck()
+    if WARM_ASSETS:
+        threading.Thread(target=card_assets.build_assets, kwargs={"manifest": manifest},
+                         daemon=True).start()
+    return manifest
+
+
+@st.cache_resource
+def get_startup_timings():
+    return {"setup": None, "first_reading": None}
+
+
+@st.cache_resource
+def get_image_cache():
+    if shared_assets.ENABLED:
+        cache = get_shared_assets()
+        metrics.add_collector(cache.gauges)
+        return cache
+    # One cache shared by every session in this process
+    manifest = get_asset_manifest()
+    cache = ImageCache(lambda *key: read_asset(manifest, *key))
+    metrics.add_collector(cache.gauges)
+    return cache
+
+
+@st.cache_resource
+def get_spread_compositor():
+    # Page composites for thumbnail spreads, cached by (card IDs, orientations, layout, width)
+    compositor = SpreadCompositor(get_image_cache())
+    metrics.add_collector(lambda: compositor.cache.gauges("spread_cache_"))
+    return compositor
+
+
+@st.cache_resource
+def get_reading_history():
+    # Survives session resets; readings are written in batches in the background
+    return ReadingHistory()
+
+
+@st.cache_resource
+def start_metrics_flusher():
+    # Periodic Prometheus text dump; only when TAROT_METRICS_FILE is set
+    if metrics.ENABLED and metrics.METRICS_FILE:
+        metrics.start_file_flusher(metrics.METRICS_FILE)
+
+
+@st.cache_resource
+def get_prefetch_pool():
+    # Loads card images into the shared cache off the script thread
+    return ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="card-prefetch")
+
+
+asset_manifest = get_asset_manifest()
+image_cache = get_image_cache()
+spread_compositor = get_spread_compositor()
+prefetch_pool = get_prefetch_pool()
+history = get_reading_history()
+start_metrics_flusher()
+
+# Imports and the shared resources above are paid for by the first run in this process
+startup = get_startup_timings()
+setup_run = startup["setup"] is None
+if setup_run:
+    startup["setup"] = time.perf_counter() - run_started
 
 # Initialize session state
 for key, default in {
@@ -28,15 +127,25 @@ for key, default in {
     "clarifier_drawn": False,
     "clarifier_card": None,
     "deck_pointer": 0,
-    "shuffled_deck": []
+    "shuffled_deck": [],
+    "seed": None,
+    "spread": None,
+    "revealed": 0,
+    # Seeds of the readings drawn in this session, so the sidebar only lists its own
+    "history_seeds": [],
+    "history_since": time.time(),
 }.items():
     if key not in st.session_state:
         st.session_state[key] = default
 
-# User selects how many cards
-total_cards = st.radio("How many cards would you like to draw?", [1, 3])
+# User picks a spread
+spread_key = st.radio("Which spread would you like?", list(spreads),
+                      format_func=lambda key: spreads[key].title)
+spread = spreads[spread_key]
+# The spread on the table, which stays put if the choice above changes
+drawn_spread = spreads.get(st.session_state.spread)
 
-# Top row: draw, reset, clarifier, reveal last
+# Top row: draw, reset, clarifier, reveal more, reveal last
 col1, col2, col3 = st.columns([1, 1, 1])
 with col1:
     draw_cards = st.button("🔁 Draw Cards")
@@ -44,15 +153,20 @@ with col2:
     reset_game = st.button("🔄 Reset Reading")
 with col3:
     draw_clarifier = False
+    reveal_more = False
     reveal_final = False
-    if st.session_state.draw_triggered and not st.session_state.clarifier_drawn:
-        draw_clarifier = st.button("🃏 Draw Clarifier Card", key="clarifier_button")
-    if st.session_state.draw_triggered and not st.session_state.final_card_revealed:
-        reveal_final = st.button("🔒 Reveal Last Card", key="final_button")
+    if st.session_state.draw_triggered and drawn_spread:
+        if drawn_spread.clarifier and not st.session_state.clarifier_drawn:
+            draw_clarifier = st.button("🃏 Draw Clarifier Card", key="clarifier_button")
+        if st.session_state.revealed < len(st.session_state.selected_cards):
+            step = min(drawn_spread.reveal, len(st.session_state.selected_cards) - st.session_state.revealed)
+            reveal_more = st.button(f"▶ Reveal Next {step} Cards", key="reveal_button")
+        if drawn_spread.final and not st.session_state.final_card_revealed:
+            reveal_final = st.button("🔒 Reveal Last Card", key="final_button")
 
 # Reset state
 if reset_game:
-    for key in ["selected_cards", "orientations", "shuffled_deck", "deck_pointer",
+    for key in ["selected_cards", "orientations", "shuffled_deck", "deck_pointer", "revealed",
                 "clarifier_drawn", "clarifier_card", "final_card_revealed", "final_card"]:
         st.session_state[key] = [] if isinstance(st.session_state[key], list) else False
     st.rerun()
@@ -60,37 +174,47 @@ if reset_game:
 # Draw new cards
 if draw_cards:
     st.session_state.draw_triggered = True
-    timestamp = int(time.time() * 1000)  # Milliseconds
-    entropy = int.from_bytes(os.urandom(4), "big")
-    seed = timestamp ^ entropy  # XOR for added randomness
-
-    
-    # seed = random.random() * 143 * DAY * MONTH * YEAR
-    random.seed(seed)
-    deck_copy = deck[:]
-    random.shuffle(deck_copy)
-    st.session_state.shuffled_deck = deck_copy
-    st.session_state.deck_pointer = 0
-    st.session_state.selected_cards = deck_copy[:total_cards]
-    st.session_state.deck_pointer += total_cards
-    st.session_state.orientations = [
-        "reversed" if random.random() < 0.3 else "upright"
-        for _ in st.session_state.selected_cards
-    ] if total_cards == 1 else ["upright"] * total_cards
+    # Fresh 64-bit OS seed per reading; the global random module is never touched
+    with metrics.timer("shuffle"):
+        reading = spread.draw()
+    metrics.count("readings")
+    drawn_spread = spread
+    st.session_state.spread = spread.key
+    st.session_state.seed = reading.seed
+    st.session_state.shuffled_deck = reading.order
+    st.session_state.deck_pointer = spread.size
+    st.session_state.selected_cards = reading.cards
+    st.session_state.orientations = reading.orientations
+    st.session_state.revealed = spread.reveal
     st.session_state.clarifier_drawn = False
     st.session_state.clarifier_card = None
     st.session_state.final_card_revealed = False
     st.session_state.final_card = None
+    st.session_state.page_start = 0
+    history.append(reading.seed, spread.size, reading.cards, reading.orientations,
+                   clarifier=reading.clarifier, final=reading.final)
+    st.session_state.history_seeds.append(reading.seed)
+
+    # The clarifier and final card are already known; have them ready before they are asked for
+    for card_id in (reading.clarifier, reading.final):
+        if card_id is not None:
+            prefetch_pool.submit(image_cache.get, catalog[card_id].filename)
 
 # Handle clarifier draw
 if draw_clarifier:
     if st.session_state.deck_pointer < len(st.session_state.shuffled_deck):
         clarifier = st.session_state.shuffled_deck[st.session_state.deck_pointer]
         st.session_state.deck_pointer += 1
-        st.session_state.selected_cards.append(clarifier)
-        st.session_state.orientations.append("upright")
         st.session_state.clarifier_card = clarifier
         st.session_state.clarifier_drawn = True
+        metrics.count("clarifier_draws")
+
+# Reveal the next batch of a large spread, and turn to the page it lands on
+if reveal_more:
+    first_new = st.session_state.revealed
+    st.session_state.revealed = min(st.session_state.revealed + drawn_spread.reveal,
+                                    len(st.session_state.selected_cards))
+    st.session_state.page_start = first_new - first_new % drawn_spread.page_size
 
 # Handle final card reveal
 if reveal_final:
@@ -98,63 +222,158 @@ if reveal_final:
         final = st.session_state.shuffled_deck.pop()
         st.session_state.final_card = final
         st.session_state.final_card_revealed = True
+        metrics.count("final_reveals")
 
 # Show reading
-if st.session_state.selected_cards:
-    st.subheader("Your Tarot Reading:")
-    labels = ["Past", "Present", "Future"] if total_cards == 3 else []
-
-    num_base = 3 if total_cards == 3 else 1
-    num_cards = num_base + 1 if st.session_state.clarifier_drawn else num_base
-    cols = st.columns(num_cards)
-
-    for i in range(num_cards):
-        if i < len(st.session_state.selected_cards):
-            filename = st.session_state.selected_cards[i]
-            orientation = st.session_state.orientations[i]
-            meta = card_metadata.get(filename, {})
-            title = meta.get("title", filename.replace("_", " ").title())
-            meaning = meta.get(orientation, meta.get("description", "No description available."))
-
-            with cols[i]:
-                if labels and i < len(labels):
-                    st.markdown(f"#### {labels[i]}")
-                elif st.session_state.clarifier_drawn and i == num_base:
-                    st.markdown("#### Clarifier")
-                img_path = os.path.join(image_dir, filename)
-                img = Image.open(img_path)
-                if orientation == "reversed":
-                    img = img.rotate(180)
-                st.image(img, width=200)
-                st.markdown(f"### {title}{' (Reversed)' if orientation == 'reversed' else ''}")
-                st.markdown(meaning)
-        else:
-            with cols[i]:
-                st.empty()
+visible = []
+if st.session_state.selected_cards and drawn_spread:
+    st.subheader(f"Your Tarot Reading: {drawn_spread.title}")
+    revealed = min(st.session_state.revealed, len(st.session_state.selected_cards))
+    page_size = drawn_spread.page_size
+
+    # Large spreads are paged; cards off the current page are not loaded at all
+    start = 0
+    if revealed > page_size:
+        start = st.radio("Showing cards", range(0, revealed, page_size), horizontal=True,
+                         format_func=lambda s: f"{s + 1}–{min(s + page_size, revealed)}",
+                         key="page_start")
+    stop = min(start + page_size, revealed)
+    visible = list(range(start, stop))
+    cards = st.session_state.selected_cards
+    orientations = st.session_state.orientations
+
+    # Thumbnail spreads and spreads with their own cell layout go out as one
+    # composite per page, laid out as defined. Other spreads pass each card's
+    # cached JPEG straight through, filled in as soon as it is ready.
+    composite = drawn_spread.card_width == card_assets.THUMBNAIL_WIDTH or drawn_spread.layout == "cells"
+    # Text rows are as wide as the image rows, so each card lines up with its text
+    columns = drawn_spread.columns
+    pending = {}
+    if composite:
+        spread_slot = st.empty()
+        spread_future = prefetch_pool.submit(
+            spread_compositor.get, cards[start:stop], orientations[start:stop],
+            drawn_spread.cells(start, stop), drawn_spread.card_width,
+        )
+
+    for row_start in range(start, stop, columns):
+        row = visible[row_start - start:row_start - start + columns]
+        cols = st.columns(columns)
+        for col, i in zip(cols, row):
+            with metrics.timer("metadata_lookup"):
+                card = catalog[cards[i]]
+            label = drawn_spread.positions[i].label
+            with col:
+                if label:
+                    st.markdown(f"#### {label}")
+                if not composite:
+                    slot = st.empty()
+                    future = prefetch_pool.submit(image_cache.get, card.filename, orientations[i],
+                                                  drawn_spread.card_width)
+                    pending[future] = slot
+                st.markdown(f"### {card.title}{' (Reversed)' if orientations[i] == 'reversed' else ''}")
+                st.markdown(card.meaning(orientations[i]))
+
+    # Warm the cards the next reveal will show, in the format they will be read in:
+    # composites are pasted from PART_FORMAT variants, not the JPEGs
+    next_fmt = PART_FORMAT if composite else card_assets.DEFAULT_FORMAT
+    for card_id, orientation in zip(cards[revealed:revealed + drawn_spread.reveal],
+                                    orientations[revealed:revealed + drawn_spread.reveal]):
+        prefetch_pool.submit(image_cache.get, catalog[card_id].filename, orientation,
+                             drawn_spread.card_width, next_fmt)
+
+    # Wait for the compose or load outside the timer, so image_encode is only st.image's own work
+    if composite:
+        with metrics.timer("spread_wait"):
+            page_image = spread_future.result()
+        with metrics.timer("image_encode"):
+            spread_slot.image(page_image)
+    for future in as_completed(pending):
+        card_image = future.result()
+        with metrics.timer("image_encode"):
+            pending[future].image(card_image, width=drawn_spread.card_width)
+
+# Show clarifier if drawn
+if st.session_state.clarifier_drawn and st.session_state.clarifier_card is not None:
+    st.subheader("🃏 Clarifier")
+    with metrics.timer("metadata_lookup"):
+        clarifier = catalog[st.session_state.clarifier_card]
+    with metrics.timer("image_encode"):
+        st.image(image_cache.get(clarifier.filename), width=200)
+    st.markdown(f"### {clarifier.title}")
+    st.markdown(clarifier.upright)
 
 # Show final card if revealed
-if st.session_state.final_card_revealed and st.session_state.final_card:
+if st.session_state.final_card_revealed and st.session_state.final_card is not None:
     st.subheader("🔓 Final Card Revealed")
-    final = st.session_state.final_card
-    meta = card_metadata.get(final, {})
-    title = meta.get("title", final.replace("_", " ").title())
-    meaning = meta.get("upright", meta.get("description", "No description available."))
+    with metrics.timer("metadata_lookup"):
+        final = catalog[st.session_state.final_card]
 
     with st.container():
         st.markdown("<div style='border: 2px solid #999; padding: 10px; border-radius: 8px; margin-top: 20px;'>", unsafe_allow_html=True)
-        st.image(os.path.join(image_dir, final), width=200)
-        st.markdown(f"### {title}")
-        st.markdown(meaning)
+        with metrics.timer("image_encode"):
+            st.image(image_cache.get(final.filename), width=200)
+        st.markdown(f"### {final.title}")
+        st.markdown(final.upright)
         st.markdown("</div>", unsafe_allow_html=True)
 
-# Show full metadata
+# Time-to-first-reading: the first run's setup plus the first rerun in this process
+# that shows a reading, leaving out however long the visitor took to click Draw
+if st.session_state.selected_cards and startup["first_reading"] is None:
+    elapsed = time.perf_counter() - run_started
+    if not setup_run:
+        elapsed += startup["setup"]
+    startup["first_reading"] = elapsed
+    metrics.observe("first_reading", elapsed)
+    if elapsed > metrics.FIRST_READING_BUDGET:
+        logger.warning("time to first reading %.2fs exceeds the %.2fs budget",
+                       elapsed, metrics.FIRST_READING_BUDGET)
+    else:
+        logger.info("time to first reading %.2fs", elapsed)
+
+# Show full metadata for the cards on screen
 with st.expander("Click to view full card metadata"):
-    for filename in st.session_state.selected_cards:
-        meta = card_metadata.get(filename, {})
-        st.markdown(f"**{meta.get('title', filename)}**")
-        st.markdown(f"- **Upright:** {meta.get('upright', meta.get('description', '-') )}")
-        st.markdown(f"- **Reversed:** {meta.get('reversed', '-')}")
-        st.markdown(f"- **Zodiac:** {meta.get('zodiac', '-')}")
-        st.markdown(f"- **Element:** {meta.get('element', '-')}")
-        st.markdown(f"- **Yes/No:** {meta.get('yes_no', '-')}")
+    shown = [st.session_state.selected_cards[i] for i in visible]
+    if st.session_state.clarifier_drawn and st.session_state.clarifier_card is not None:
+        shown.append(st.session_state.clarifier_card)
+    for card_id in shown:
+        card = catalog[card_id]
+        st.markdown(f"**{card.title}**")
+        st.markdown(f"- **Upright:** {card.upright}")
+        st.markdown(f"- **Reversed:** {card.reversed}")
+        st.markdown(f"- **Zodiac:** {card.zodiac}")
+        st.markdown(f"- **Element:** {card.element}")
+        st.markdown(f"- **Yes/No:** {card.yes_no}")
         st.markdown("---")
+
+# This session's saved readings, newest first, and card totals across every session
+with st.sidebar:
+    with metrics.timer("history_query"):
+        recent = history.with_seeds(st.session_state.history_seeds,
+                                    st.session_state.history_since, HISTORY_SHOWN)
+        frequencies = history.card_frequencies(HISTORY_SHOWN)
+    st.subheader(f"📜 Your last {HISTORY_SHOWN} readings")
+    if not recent:
+        st.caption("No saved readings yet.")
+    for saved in recent:
+        when = time.strftime("%d %b %Y %H:%M", time.localtime(saved.timestamp))
+        titles = ", ".join(
+            catalog[card_id].title + (" (R)" if orientation == "reversed" else "")
+            for card_id, orientation in zip(saved.cards, saved.orientations)
+        )
+        if saved.truncated:
+            # Only the first cards of large spreads are stored
+            titles += f", … +{saved.spread_size - len(saved.cards)}"
+        st.markdown(f"**{when}** · {titles}")
+    if any(drawn for _, drawn in frequencies):
+        st.subheader("Most drawn cards, all readings")
+        for card_id, drawn in frequencies:
+            if drawn:
+                st.markdown(f"- {catalog[card_id].title}: {drawn}")
+
+# Per-rerun timings; the trace panel only appears with TAROT_TRACE=1
+metrics.observe("rerun", time.perf_counter() - run_started)
+if metrics.TRACE:
+    spans = metrics.end_trace()
+    with st.sidebar.expander("Rerun trace", expanded=True):
+        st.code("\n".join(f"{name:24} {seconds * 1000:9.2f} ms" for name, seconds in spans))
@@ -0,0 +1,109 @@
+import os
+
+import numpy as np
+
+import reading_history
+from reading_history import (HEADER, MAX_CARDS, POSTING, RECORD, ReadingHistory, decode,
+                             encode)
+
+
+def _history(path):
+    return ReadingHistory(str(path), flush_interval=0)
+
+
+def _append_raw(path, records):
+    # A writer that appended its batch but died before updating the indexes
+    with open(os.path.join(path, reading_history.RECORDS_NAME), "ab") as f:
+        f.write(np.array(records, dtype=RECORD).tobytes())
+
+
+def _postings(history, card_id):
+    return history._postings(card_id).tolist()
+
+
+def test_encode_decode_round_trip():
+    record = encode(2 ** 64 - 1, 3, [5, 0, 77], ["upright", "reversed", "reversed"],
+                    clarifier=12, final=40, timestamp=1_700_000_000.123)
+    assert RECORD.itemsize == 32
+    saved = decode(record, 7)
+    assert saved.number == 7
+    assert saved.timestamp == 1_700_000_000.123
+    assert saved.seed == 2 ** 64 - 1
+    assert saved.spread_size == 3
+    assert saved.cards == (5, 0, 77)
+    assert saved.orientations == ("upright", "reversed", "reversed")
+    assert (saved.clarifier, saved.final) == (12, 40)
+    assert not saved.truncated
+
+
+def test_encode_truncates_large_spreads():
+    cards = list(range(78))
+    saved = decode(encode(1, 78, cards, ["reversed"] * 78))
+    assert saved.truncated
+    assert saved.spread_size == 78
+    assert saved.cards == tuple(range(MAX_CARDS))
+    assert saved.orientations == ("reversed",) * MAX_CARDS
+    assert saved.clarifier is None and saved.final is None
+
+
+def test_store_round_trip(tmp_path):
+    history = _history(tmp_path)
+    history.append(1, 3, [1, 2, 3], ["upright", "reversed", "upright"], clarifier=4, final=5)
+    history.append(2, 1, [6], ["reversed"])
+    assert [saved.seed for saved in history.recent()] == [2, 1]
+    history.flush()
+
+    reopened = _history(tmp_path)
+    assert len(reopened) == 2
+    newest, oldest = reopened.recent()
+    assert (newest.number, newest.seed, newest.cards, newest.orientations) == (1, 2, (6,), ("reversed",))
+    assert (oldest.cards, oldest.clarifier, oldest.final) == ((1, 2, 3), 4, 5)
+    assert [saved.seed for saved in reopened.with_card(2)] == [1]
+    assert reopened.card_counts()[2].tolist() == [0, 1, 0, 0]
+
+
+def test_torn_tail_is_cut_before_the_next_batch(tmp_path):
+    history = _history(tmp_path)
+    history.append(1, 3, [1, 2, 3], ["upright"] * 3)
+    history.flush()
+    records_path = os.path.join(tmp_path, reading_history.RECORDS_NAME)
+    with open(records_path, "ab") as f:
+        f.write(b"\xff" * 13)
+
+    reopened = _history(tmp_path)
+    reopened.append(2, 3, [4, 5, 6], ["upright"] * 3)
+    reopened.flush()
+    assert os.path.getsize(records_path) == HEADER.size + 2 * RECORD.itemsize
+    assert [saved.seed for saved in reopened.recent()] == [2, 1]
+    assert [saved.seed for saved in reopened.with_card(5)] == [2]
+    assert reopened.card_counts()[:7, 0].tolist() == [0, 1, 1, 1, 1, 1, 1]
+
+
+def test_interrupted_index_update_is_repaired(tmp_path):
+    history = _history(tmp_path)
+    history.append(1, 3, [1, 2, 3], ["upright"] * 3)
+    history.flush()
+    # The dead writer got as far as a stray posting for its record
+    _append_raw(tmp_path, [encode(2, 3, [3, 4, 5], ["reversed"] * 3)])
+    with open(history._postings_path(3), "ab") as f:
+        f.write(np.array([1, 1], dtype=POSTING).tobytes())
+
+    reopened = _history(tmp_path)
+    assert _postings(reopened, 3) == [0, 1]
+    assert _postings(reopened, 4) == [1]
+    counts = reopened.card_counts()
+    assert counts[3].tolist() == [1, 1, 0, 0]
+    assert counts[5].tolist() == [0, 1, 0, 0]
+    assert np.array_equal(counts, reading_history._card_counts(reopened._records()))
+
+
+def test_truncated_spread_cards_are_not_indexed(tmp_path):
+    history = _history(tmp_path)
+    history.append(1, 78, list(range(78)), ["upright"] * 78)
+    history.append(2, 3, [0, 1, 2], ["upright"] * 3, clarifier=9)
+    assert history.card_counts()[0].tolist() == [1, 0, 0, 0]
+    history.flush()
+    assert history.card_counts()[0].tolist() == [1, 0, 0, 0]
+    assert history.card_counts()[9].tolist() == [0, 0, 1, 0]
+    assert [saved.seed for saved in history.with_card(0)] == [2]
+    assert [saved.seed for saved in history.with_card(5)] == []